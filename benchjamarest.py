@@ -0,0 +1,174 @@
+'''
+Benchmarks of jamarest against the local jamamock server, so performance can be measured without touching a real JAMA.
+
+Run:
+    python benchjamarest.py --items 5000 --latency 0.01 --json bench.json
+and in CI, fail if anything has got more than 20% slower than a saved run:
+    python benchjamarest.py --compare bench.json --tolerance 0.2
+'''
+
+import argparse
+import json
+import sys
+import time
+
+from jamarest import jama, RequestMetrics
+from jamamock import JamaMockServer
+from jamatrace import crawl_trace
+from jamastats import plan_test_runs
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def bench_lookup_startup(jam):
+    jam.lookup
+    return len(jam.lookup)
+
+
+def bench_ask_big(jam):
+    return len(jam.ask_big("/abstractitems", {"project": 1}))
+
+
+def bench_ask_big_parallel(jam):
+    return len(jam.ask_big("/abstractitems", {"project": 1}, workers=8))
+
+
+def bench_iter_big(jam):
+    return sum(1 for _ in jam.iter_big("/abstractitems", {"project": 1}, readahead=True))
+
+
+def bench_trace_crawl(jam):
+    return len(crawl_trace(jam, roots=[1], direction="downstream", depth=8, workers=8))
+
+
+def bench_find_req_ids(jam):
+    return len(jam.find_req_ids([f"REQ-{i}" for i in range(1, 1001)], workers=8))
+
+
+def bench_bulk_testcases(jam):
+    specs = [{"name": f"Bench {i}", "description": "", "steps": []} for i in range(200)]
+    ids, failures = jam.create_testcases(specs, parent_id=1, project=1, workers=8)
+    return len(ids) - len(failures)
+
+
+def bench_publish_runs(jam):
+    runs = jam.get_testruns(1)
+    results = {run["id"]: {"steps": run["fields"]["testRunSteps"], "tester": "Bob Tester"} for run in runs}
+    published, failures = jam.publish_runs(results, workers=8)
+    return len(published)
+
+
+def bench_plan_stats(jam):
+    table = plan_test_runs(jam, 1, workers=8)
+    table.pass_rates("group")
+    table.latest_status()
+    table.flaky()
+    return len(table)
+
+
+def bench_activity_scan(jam):
+    from datetime import date, timedelta
+
+    return len(jam.get_activities(date.today() - timedelta(days=365), date.today() - timedelta(days=1), projects=[1]))
+
+
+BENCHMARKS = [
+    ("lookup_startup", bench_lookup_startup),
+    ("ask_big", bench_ask_big),
+    ("ask_big_parallel", bench_ask_big_parallel),
+    ("iter_big", bench_iter_big),
+    ("trace_crawl", bench_trace_crawl),
+    ("find_req_ids", bench_find_req_ids),
+    ("bulk_testcases", bench_bulk_testcases),
+    ("publish_runs", bench_publish_runs),
+    ("plan_stats", bench_plan_stats),
+    ("activity_scan", bench_activity_scan),
+]
+
+
+def run_benchmarks(server, names=None, rate_limit=1000):
+    """
+    Run each benchmark with a fresh client
+    :param server: <JamaMockServer> : Started server to run against
+    :param names: <list of str> : Benchmarks to run, default all
+    :param rate_limit: <float> : Client rate limit, requests per second
+    :return: <dict> : Dict of benchmark name: dict of results
+    """
+    results = {}
+    for name, bench in BENCHMARKS:
+        if names and name not in names:
+            continue
+        latencies = []
+        metrics = RequestMetrics(hooks=[lambda event: latencies.append(event["seconds"])])
+        with jama(server.base_url, "bench", "bench", rate_limit=rate_limit, metrics=metrics) as jam:
+            started = time.perf_counter()
+            count = bench(jam)
+            seconds = time.perf_counter() - started
+        requests = sum(x["requests"] for x in metrics.snapshot().values())
+        results[name] = {
+            "seconds": seconds,
+            "requests": requests,
+            "results": count,
+            "requests_per_second": requests / seconds if seconds else 0.0,
+            "results_per_second": count / seconds if seconds else 0.0,
+            "p50_ms": 1000 * percentile(latencies, 0.5),
+            "p95_ms": 1000 * percentile(latencies, 0.95),
+        }
+    return results
+
+
+def print_results(results):
+    print(f"{'benchmark':20} {'secs':>8} {'reqs':>6} {'req/s':>8} {'results':>8} {'res/s':>9} {'p50 ms':>7} {'p95 ms':>7}")
+    for name, r in results.items():
+        print(
+            f"{name:20} {r['seconds']:>8.3f} {r['requests']:>6} {r['requests_per_second']:>8.1f} {r['results']:>8}"
+            f" {r['results_per_second']:>9.1f} {r['p50_ms']:>7.1f} {r['p95_ms']:>7.1f}"
+        )
+
+
+def regressions(results, baseline, tolerance):
+    """
+    :return: <list of str> : Benchmarks that took more than tolerance longer, or made more requests, than baseline
+    """
+    found = []
+    for name, r in results.items():
+        if name not in baseline:
+            continue
+        base = baseline[name]
+        if r["seconds"] > base["seconds"] * (1 + tolerance):
+            found.append(f"{name}: {r['seconds']:.3f}s, was {base['seconds']:.3f}s")
+        if r["requests"] > base["requests"]:
+            found.append(f"{name}: {r['requests']} requests, was {base['requests']}")
+    return found
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=2000, help="Requirements in the mock project")
+    parser.add_argument("--testruns", type=int, default=200, help="Test runs in the mock test cycle")
+    parser.add_argument("--latency", type=float, default=0.005, help="Seconds the mock server takes to answer")
+    parser.add_argument("--server-rate", type=float, default=None, help="Requests per second before the mock server throttles")
+    parser.add_argument("--rate", type=float, default=1000, help="Client rate limit, requests per second")
+    parser.add_argument("--only", nargs="*", help="Benchmarks to run")
+    parser.add_argument("--json", help="Write results to this file")
+    parser.add_argument("--compare", help="Fail if slower than the results in this file")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Fraction slower allowed by --compare")
+    args = parser.parse_args()
+
+    with JamaMockServer(items=args.items, testruns=args.testruns, latency=args.latency, rate_limit=args.server_rate) as server:
+        results = run_benchmarks(server, args.only, args.rate)
+    print_results(results)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            found = regressions(results, json.load(f), args.tolerance)
+        for line in found:
+            print("REGRESSION", line)
+        sys.exit(1 if found else 0)
@@ -2,12 +2,12 @@
 Created on 15 Apr 2019
 
 Get number of JAMA creator events over last year
-Takes a while to run, but displays each day as it goes.
+Fetches each project's activities a month at a time, then displays each day.
 
 @author: amaccormack
 '''
 
-from jamarest import jama
+from jamarest import jama, bucket_activities
 
 if __name__ == '__main__':
     username = "autocreator"
@@ -23,9 +23,6 @@ if __name__ == '__main__':
     print(f"Attempting to authenticate to Jama Rest API using username is: {username} \n")
     
     jam = jama(base_url=api_base_url, username=username, password=password)
-    presp=jam.ask_big('/projects')
-    projects={x['id']: x['fields']['name'] for x in presp}
-
     from datetime import date 
     from datetime import timedelta
     startdate=date.today() - timedelta(days=365)
@@ -33,20 +30,17 @@ if __name__ == '__main__':
     usermap=jam.get_all_users(include_inactive=True)
     totals={}
 
+    activities=jam.get_activities(startdate, enddate)
+    usersbyday={}
+    for day, user in bucket_activities(activities, keys=('day', 'user')):
+        usersbyday.setdefault(day, []).append(user)
+
     checkdate=startdate
     while checkdate<=enddate:
-        userstoday={}
         isodate=checkdate.isoformat()
-        for projid, projname in projects.items():
-            activities=jam.ask_big('/activities', doseq=True, args={
-                'project': projid,
-                'date': [f'{isodate}T00:00:00Z', f'{isodate}T23:59:29Z'],
-                'eventType': ['UPDATE', 'DELETE', 'CREATE'],
-                })
-            for act in activities:
-                userstoday[act["user"]]=True
-        count=len(list(userstoday.keys()))
-        print("{}: {} users changed stuff: {}".format(isodate, count, [usermap.get(x, x) for x in userstoday.keys()]))
+        userstoday=usersbyday.get(isodate, [])
+        count=len(userstoday)
+        print("{}: {} users changed stuff: {}".format(isodate, count, [usermap.get(x, x) for x in userstoday]))
         totals[isodate]=count
         checkdate=checkdate+timedelta(days=1)
     
@@ -0,0 +1,841 @@
+"""
+JAMA REST API asyncio module
+Mirrors the jama class in jamarest, for use from an asyncio event loop, so many requests can be overlapped
+without a thread per request. Needs aiohttp.
+
+Usage:
+    async with AsyncJama(base_url, username, password) as jama:
+        items = await jama.ask_big("/abstractitems", {"project": 1})
+
+The MIT licence:
+Copyright (c) 2016-2019 Optos plc
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated documentation files (the "Software"), to deal in the Software without restriction, including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+import asyncio
+import urllib.parse
+import time
+import re
+
+import aiohttp
+
+import jamarest
+
+
+class AsyncTokenBucket(jamarest.TokenBucket):
+    """
+    Token bucket rate limiter for coroutines: as TokenBucket, but waiting for a token does not block the event loop
+    """
+
+    async def acquire(self, tokens=1):
+        """
+        Wait until a request may be made
+        :param tokens: <int> : Number of requests to take from the bucket
+        :return: <float> : Seconds spent waiting
+        """
+        waited = 0.0
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now >= self.blocked_until and self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return waited
+                wait = max(
+                    self.blocked_until - now, (tokens - self.tokens) / self.rate
+                )
+            await asyncio.sleep(wait)
+            waited += wait
+
+
+class AsyncJama:
+    def __init__(
+        self,
+        base_url,
+        username,
+        password,
+        debug=False,
+        retry_delay=2,
+        pool_size=10,
+        max_in_flight=10,
+        headers=None,
+        rate_limit=12,
+        burst=None,
+        limiter=None,
+    ):
+        self.base_url = re.sub("/$", "", base_url)  # remove trailing /
+        self.auth = (username, password)
+        self.project_id = None
+        self.retry_delay = retry_delay
+        self.debug = debug
+        self.pool_size = pool_size
+        self.headers = {"Accept": "application/json"}
+        if headers:
+            self.headers.update(headers)
+        self.limiter = limiter or AsyncTokenBucket(rate_limit, burst)
+        self.in_flight = asyncio.Semaphore(max_in_flight)
+        self.session = None
+        self.lookup = {}
+        self.users = {}
+
+    async def open(self):
+        """
+        Open the connection pool and load the lookup tables
+        """
+        if self.session is None:
+            self.session = aiohttp.ClientSession(
+                auth=aiohttp.BasicAuth(*self.auth),
+                headers=self.headers,
+                connector=aiohttp.TCPConnector(limit=self.pool_size),
+            )
+            self.lookup = await self.get_lookup()
+        return self
+
+    async def close(self):
+        """
+        Close the pooled connections to the server
+        """
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    async def __aenter__(self):
+        return await self.open()
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def _send(self, method, full_url, **kwargs):
+        """
+        Send one request through the rate limiter and in-flight cap, reading the whole body before returning
+        :param method: <str> : HTTP method
+        :param full_url: <str> : URL to request
+        :return: <aiohttp response> : with body read, so await response.json() works
+        """
+        async with self.in_flight:
+            await self.limiter.acquire()
+            async with self.session.request(method, full_url, **kwargs) as response:
+                await response.read()
+        if response.status == 429:
+            self.limiter.throttled(
+                jamarest.retry_after_seconds(response) or self.retry_delay
+            )
+        else:
+            self.limiter.success()
+        return response
+
+    async def ask(self, resource):
+        """
+        Make a single request to the JAMA REST API, for the named resource, retrying once if we get the throttled response
+        :param resource:
+        :return
+        """
+        if resource[0] != "/":
+            resource = "/" + resource  # add leading / if required
+        full_url = self.base_url + resource
+        if self.debug:
+            print(full_url)
+        try:
+            response = await self._send("GET", full_url)
+        except aiohttp.ClientConnectionError:
+            response = await self._send("GET", full_url)
+        if response.status == 429:
+            print("Retrying JAMA access")
+            response = await self._send("GET", full_url)
+            if response.status == 429:
+                raise Exception("JAMA overload")
+        elif response.status >= 300:
+            raise Exception(f"JAMA API Non-success code {response.status} for {full_url}")
+        return response
+
+    async def ask_json(self, resource):
+        """
+        Make a single request to the JAMA REST API, returning the decoded JSON
+        :param resource:
+        :return: <dict>
+        """
+        response = await self.ask(resource)
+        return await response.json(content_type=None)
+
+    async def _request(self, resource, json, method):
+        if resource[0] != "/":
+            resource = "/" + resource  # add leading / if required
+        full_url = self.base_url + resource
+        if self.debug:
+            print(method, full_url)
+        response = await self._send(method, full_url, json=json)
+        if response.status == 401:
+            raise Exception(f"JAMA API Unauthorised when attempting {method} as {self.auth[0]}")
+        return response
+
+    async def put(self, resource, json):
+        return await self._request(resource, json, "PUT")
+
+    async def post(self, resource, json):
+        return await self._request(resource, json, "POST")
+
+    async def _delete(self, resource):
+        return await self._request(resource, None, "DELETE")
+
+    _page_items = jamarest.jama._page_items
+    _name_criteria = jamarest.jama._name_criteria
+    _search_criteria = jamarest.jama._search_criteria
+
+    async def _pages(self, resource, args, doseq=False):
+        """
+        Async generator for the raw response of each page of a resource, in order.
+        Once the first page tells us totalResults, the remaining pages are all requested at once,
+        limited by the rate limiter and the in-flight cap
+        :param resource: <str> : Endpoint to query
+        :param args: <dict> : Arguments to add to URL
+        :param doseq: <bool> : Expand sequences in args to individual paramters in URL (default False)
+        :return: <async generator of dicts> : Decoded JSON response of each page
+        """
+        max_results = 50 # JAMA doesn't allow larger pages than 50
+        args = dict(args, maxResults=max_results)
+        fmt = resource + "?"
+
+        async def fetch(start_at):
+            page_args = dict(args, startAt=start_at)
+            return await self.ask_json(fmt + urllib.parse.urlencode(page_args, doseq=doseq))
+
+        resp = await fetch(0)
+        yield resp
+        total = resp["meta"]["pageInfo"]["totalResults"]
+        tasks = [
+            asyncio.ensure_future(fetch(start_at))
+            for start_at in range(max_results, total, max_results)
+        ]
+        try:
+            for task in tasks:
+                yield await task
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def ask_big(self, resource, args={}, field="data", doseq=False):
+        """
+        Make requests from resource, with args specified, handling the pagination until we have everything
+        :param resource: <str> : Endpoint to query
+        :param args: <dict> : Arguments to add to URL
+        :param field: <str> : Field to bring into return list, default is data
+        :param doseq: <bool> : Expand sequences in args to individual paramters in URL (default False)
+        :return: <list> :  List of results, or for field "tc", tuple of testcases and results
+        """
+        data = []
+        tcmap = {}
+        async for resp in self._pages(resource, args, doseq):
+            items, page_tcmap = self._page_items(resp, field)
+            if type(items) is dict:
+                return items
+            data.extend(items)
+            tcmap.update(page_tcmap)
+        if field == "tc":
+            return (tcmap, data)
+        else:
+            return data
+
+    async def iter_big(self, resource, args={}, field="data", doseq=False):
+        """
+        As ask_big, but yield results page by page as they arrive
+        :param resource: <str> : Endpoint to query
+        :param args: <dict> : Arguments to add to URL
+        :param field: <str> : Field to bring into return list, default is data
+        :param doseq: <bool> : Expand sequences in args to individual paramters in URL (default False)
+        :return: <async generator> : Each result, or for field "tc", tuples of (testcases on that page, result)
+        """
+        async for resp in self._pages(resource, args, doseq):
+            items, tcmap = self._page_items(resp, field)
+            if type(items) is dict:  # Single item resource
+                yield (tcmap, items) if field == "tc" else items
+                return
+            for item in items:
+                yield (tcmap, item) if field == "tc" else item
+
+    async def ask_id(self, resource, name, field="name", args={}):
+        """
+        Get this ID for name from the specified resource, matching the field, with optional args for that resource
+        :param resource:
+        :param name:
+        :param field:
+        :param args:
+        :return: <int> : JAMA ID of matching item
+        """
+        resp = await self.ask_big(resource, args)
+        try:
+            if resp:
+                return next((item["id"] for item in resp if item[field] == name))
+            else:
+                return False
+        except StopIteration:
+            raise Exception(f"Could not find {resource} with {field} matching {name}")
+
+    async def ask_count(self, resource, args={}):
+        """
+        Get the count of results for the given resource, without actually retrieving them all
+        :param resource:
+        :param args:
+        :return:
+        """
+        resp = await self.ask_json(resource + "?" + urllib.parse.urlencode(args))
+        return resp["meta"]["pageInfo"]["totalResults"]
+
+    async def ask_dict(self, resource, field="name", args={}):
+        """
+        Get a dict of the results of the resource's (name) field, with optional args for that resource
+        :param resource: <str>
+        :param field: <str> Defaults to "name"
+        :param args: <dict>
+        :return: <dict>
+        """
+        resp = await self.ask_big(resource, args)
+        return {item["id"]: item[field] for item in resp}
+
+    async def get_project_id(self, project):
+        """
+        Get the JAMA ID for a project
+        :param project: <str>
+        :return: <int> : JAMA Project ID
+        """
+        return await self.ask_id("/projects", project, field="projectKey")
+
+    async def set_project(self, project):
+        """
+        Set the project we are talking about
+        :param project: <str>
+        :return: <int> : JAMA Project ID
+        """
+        self.project_id = await self.get_project_id(project)
+        return self.project_id
+
+    async def find_filter_id(self, name, project=None):
+        """
+        For the current project, get the ID of the named filter
+        :param name:
+        :param project:
+        :return:
+        """
+        if not project:
+            project = self.project_id
+        elif type(project) is str:
+            project = await self.get_project_id(project)
+        if project:
+            return await self.ask_id("/filters", name, args={"project": project})
+        else:
+            raise Exception("JAMA project not set")
+
+    async def get_filter_results(self, filter_id, project=None):
+        """
+        Give me the items from the name / id of the filter
+        :param filter_id: <int/str> JAMA Filter name or ID
+        :param project: <int> : JAMA Project ID (defaults to set project)
+        :return: <list> : requirements matching filter
+        """
+        if type(filter_id) is str:
+            filter_id = await self.find_filter_id(filter_id, project)
+        return await self.ask_big(f"/filters/{filter_id}/results")
+
+    async def get_downstream(self, item, args={}):
+        """
+        Given an item ID, return its downstream related items
+        :param item: <int> : Item JAMA ID
+        :return: <list> : item's downstream requirements
+        """
+        args = dict(args, include="data.toItem")
+        return await self.ask_big(
+            f"/items/{item}/downstreamrelationships", args, field="linked"
+        )
+
+    async def get_downstreamrelated(self, item, args={}):
+        """
+        Given an item ID, return its downstream related items
+        :param item: <int> : Item JAMA ID
+        :return: <list> : item's downstream requirements
+        """
+        args = dict(args, include="data.toItem")
+        return await self.ask_big(f"/items/{item}/downstreamrelated", args)
+
+    async def get_downstream_ids(self, item, args={}):
+        """
+        Given an item ID, return its downstream related items
+        :param item: <int> : Item JAMA ID
+        :return: <dict> : item's downstream requirement IDs
+        """
+        data = await self.ask_big(f"/items/{item}/downstreamrelationships", args)
+        if not data:
+            return {}
+        else:
+            return {x["id"]: x["toItem"] for x in data}
+
+    async def get_upstream_ids(self, item, field="id", args={}):
+        """
+        Given an item ID, return its upstream related items
+        :param item: <int> : Item JAMA ID
+        :param field: <str> : Field to return, default is ID (JAMA ID)
+        :return: <list> : item's upstream requirements
+        """
+        data = await self.ask_big(f"/items/{item}/upstreamrelated", args)
+        if not data:
+            return []
+        else:
+            return [x[field] for x in data]
+
+    async def get_synced(self, item, args={}):
+        """
+        Given an item ID, return its synced items
+        :param item: <int> : Item JAMA ID
+        :return: <list of str> : item's synced requirements
+        """
+        args = dict(args, include="data.toItem")
+        data = await self.ask_big(f"/items/{item}/synceditems", args)
+        if not data:
+            return []
+        else:
+            return [x["fields"]["documentKey"] for x in data]
+
+    async def get_tags(self, item, args={}):
+        """
+        Given an item ID, return its tags
+        :param item: <int> : Item JAMA ID
+        :return: <list of dicts> : item's tags
+        """
+        return await self.ask_big(f"/items/{item}/tags", args)
+
+    async def get_lookup(self, picklists=["Status"], project=None):
+        """
+        For the current project, get a big dict of all the custom values mapping to the appropriate strings, given the picklists chosen
+        :param picklists:
+        :param project:
+        :return:
+        """
+        lookup = {}
+        if not project:
+            project = self.project_id
+        if project:
+            lookup.update(await self.ask_dict("/releases", args={"project": project}))
+        plids = [await self.ask_id("/picklists", plist) for plist in picklists]
+        for options in await asyncio.gather(
+            *(self.ask_dict(f"/picklists/{plid}/options") for plid in plids)
+        ):
+            lookup.update(options)
+        itemtypes = await self.ask_dict("/itemtypes", field="display")
+        lookup.update(itemtypes)
+        lookup.update({v: k for k, v in itemtypes.items()})
+        return lookup
+
+    async def find_req_id(self, req_id):
+        """
+        For a JAMA requirement text ID, return matches
+        :param req_id: <str>
+        :return: <list>
+        """
+        return await self.ask_big("/abstractitems", {"documentKey": req_id})
+
+    async def find_item_id(self, item_id):
+        """
+        For a JAMA text ID, return matches
+        :param item_id: <str>
+        :return: <list>
+        """
+        return await self.find_req_id(item_id)
+
+    async def find_tc(self, tcname, project=None):
+        """
+        Find a test case name
+        :param tcname: <str> :  Test case name to find
+        :param project: <int> : Project to search, default is current set project
+        :return: <list>
+        """
+        if not project:
+            project = self.project_id
+        return await self.ask_big(
+            "/abstractitems",
+            {
+                "itemType": self.lookup["Test Case"],
+                "project": project,
+                "contains": tcname,
+            },
+        )
+
+    async def find_by_name(self, name, itemtype=None, project=None):
+        """
+        Find a matching item
+        :param name: <str> :  Test case name to find
+        :param itemtype: <str/int> :  Item type to find
+        :param project: <int> : Project to search, default is current set project
+        :return: <list>
+        """
+        return await self.ask_big("/abstractitems", self._name_criteria(name, itemtype, project))
+
+    async def find_uniqid(self, uniqid):
+        """
+        Given JAMA API int id, return the JAMA string ID
+        :param uniqid: <int> : Item to find
+        :return: <str> : JAMA string ID
+        """
+        resp = await self.ask_json(f"/abstractitems/{uniqid}")
+        return resp["data"]["documentKey"]
+
+    async def search(self, contains, item_type=None):
+        """
+        Find items that match a string
+        :param contains: <string> : String to search for within items
+        :param item_type: <int/string> : The type of item to search for (default: all)
+        :return: <list of dicts> : search results
+        """
+        return await self.ask_big("/abstractitems", self._search_criteria(contains, item_type))
+
+    async def testrun_islocked(self, test_id):
+        """
+        Check if test run is locked
+        :param test_id: <int> : Test run ID
+        :return: <bool> : Lock status
+        """
+        resp = await self.ask_json(f"/testruns/{test_id}/lock")
+        return resp["data"]["locked"]
+
+    async def setlock_testrun(self, test_id, locked):
+        """
+        Set test run lock status
+        :param test_id: <int> : Test run ID
+        :param locked: <bool> : Lock status
+        """
+        return await self.put(f"/testruns/{test_id}/lock", {"locked": locked})
+
+    async def lock_testrun(self, test_id):
+        """
+        Lock test run
+        :param test_id: <int> : Test run ID
+        """
+        await self.setlock_testrun(test_id, True)
+
+    async def unlock_testrun(self, test_id):
+        """
+        Unlock test run
+        :param test_id: <int> : Test run ID
+        """
+        await self.setlock_testrun(test_id, False)
+
+    async def create_testcase(self, parent_id, name, description, steps, project=None):
+        """
+        Create a new test case
+        :param parent_id: <int/string> : The parent JAMA item to create test case within
+        :param name: <string> : The name of the test case
+        :param description: <string> : The description of the test case
+        :param steps: <list of dicts> : The test steps. Each step must have fields action, expectedResult and notes in a dict.
+        :param project: <int/string> : The project to create test case in, defaults to set project
+        :return: <int> : id of created test_case
+        """
+        if not project:
+            project = self.project_id
+        if type(project) is str:
+            project = await self.get_project_id(project)
+        if type(parent_id) is str:
+            parent_id = await self.find_item_id(parent_id)
+
+        tc_item = self.lookup["Test Case"]
+        fields = {"description": description, "name": name, "testCaseSteps": steps}
+        json = {
+            "project": project,
+            "itemType": tc_item,
+            "childItemType": tc_item,
+            "location": {"parent": parent_id},
+            "fields": fields,
+        }
+        resp = await (await self.post("/items", json)).json(content_type=None)
+        try:
+            return resp["meta"]["id"]
+        except KeyError:
+            print("NO ID RETURNED:", resp)
+            raise
+
+    async def create_testplan(self, name, project=None):
+        """
+        Create a new test plan
+        :param name: <string> : The name of the test plan
+        :param project: <int/string> : The project to create test plan in, defaults to set project
+        :return: <int> : id of created test_plan
+        """
+        if not project:
+            project = self.project_id
+        if type(project) is str:
+            project = await self.get_project_id(project)
+        json = {"project": project, "fields": {"name": name}}
+        resp = await (await self.post("/testplans", json)).json(content_type=None)
+        return resp["meta"]["id"]
+
+    async def create_testgroup(self, plan, name):
+        """
+        Create a test group within a plan, return its test group ID
+        :param plan <int> : Plan JAMA ID
+        :param name <str> : Group name to create
+        :return: <int> : Test groups in plan
+        """
+        response = await self.post(f"/testplans/{plan}/testgroups", {"name": name})
+        try:
+            return (await response.json(content_type=None))["meta"]["id"]
+        except KeyError:
+            print(response.reason)
+            print(await response.text())
+            raise Exception("Creating testgroup failed")
+
+    async def get_plangroups(self, plan):
+        """
+        Given an test plan, return its test groups
+        :param plan <int> : Plan JAMA ID
+        :return: <list of dicts> : Test groups in plan
+        """
+        return await self.ask_big(f"/testplans/{plan}/testgroups")
+
+    async def get_groupcases(self, plan, group):
+        """
+        Given an test plan and group ID, return its test cases
+        :param plan <int> : Plan JAMA ID
+        :param group <int> : Group JAMA ID
+        :return: <list of dicts> : Test cases in group
+        """
+        return await self.ask_big(f"/testplans/{plan}/testgroups/{group}/testcases")
+
+    async def get_plancycles(self, plan):
+        """
+        Given an plan ID, return its test cycles
+        :param plan <int> : Plan JAMA ID
+        :return: <list of dicts> : Test cycles in plan
+        """
+        return await self.ask_big(f"/testplans/{plan}/testcycles")
+
+    async def get_links(self, item_id):
+        """
+        Given an item ID, return its links
+        :param item_id: <int> : Item JAMA ID
+        :return: <list of dicts> : item's links
+        """
+        return await self.ask_big(f"/items/{item_id}/links")
+
+    async def add_tests_to_plan(self, plan, tests, group=None):
+        """
+        add test cases to plan, all at once
+        :param plan: <int> : The parent JAMA item to add test case to
+        :param tests: <list of ints> : The test cases to add.
+        :param group: <int> : The group to create test case in, defaults to default group
+        :return: <int> : Returns the test group added to
+        """
+        if not group:
+            groups = await self.get_plangroups(plan)
+            group = groups[0]["id"]
+        await asyncio.gather(
+            *(
+                self.post(f"/testplans/{plan}/testgroups/{group}/testcases", {"testCase": test})
+                for test in tests
+            )
+        )
+        return group
+
+    async def create_testcycle(
+        self,
+        name,
+        plan,
+        groups=None,
+        description=None,
+        startdate=None,
+        enddate=None,
+        statuses=None,
+        cyclerefresh=None,
+    ):
+        """
+        create test_cycle
+        :param name: <string> : The name of the test cycle
+        :param plan: <int> : Test plan for cycle
+        :param groups: <list of ints> : The test groups to include in cycle, default all
+        :param description:
+        :param startdate: <YYYY-MM-DD string> : The start date for the cycle, defaults to today
+        :param enddate: <YYYY-MM-DD string> : The end date for the cycle, defaults to start date
+        :param statuses: <list of strings> : The test cases' statuses to include (default all)
+        :param cyclerefresh: int :  If we are just refreshing existing cycle, the cycle ID, if None (default) then create new one
+        :return: <int> : The new test_cycle id
+        """
+        if not startdate:
+            from datetime import date
+
+            startdate = date.today().isoformat()
+        if not enddate:
+            enddate = startdate
+
+        cycle_payload = {
+            "fields": {
+                "name": name,
+                "description": description,
+                "startDate": startdate,
+                "endDate": enddate,
+            },
+            "testRunGenerationConfig": {},
+        }
+        if groups:
+            cycle_payload["testRunGenerationConfig"]["testGroupsToInclude"] = groups
+        if statuses:
+            cycle_payload["testRunGenerationConfig"][
+                "testRunStatusesToInclude"
+            ] = statuses
+        if cyclerefresh:
+            await self.put(f"/testcycles/{cyclerefresh}", cycle_payload)
+            return
+        response = await self.post(f"/testplans/{plan}/testcycles", cycle_payload)
+        resp = await response.json(content_type=None)
+        try:
+            return resp["meta"]["id"]
+        except KeyError:
+            print(resp["meta"]["message"])
+            raise KeyError
+
+    async def find_user(self, first_name, last_name):
+        """
+        Given a name, look up the user ID
+        :param first_name: <str> : First name of user
+        :param first_name: <last_name> : Last name of user
+        :return: <int> : The JAMA User ID
+        """
+        key = (first_name, last_name)
+        if key not in self.users:
+            data = await self.ask_big(
+                "/users", args={"firstName": first_name, "lastName": last_name}
+            )
+            self.users[key] = data[0]["id"]
+        return self.users[key]
+
+    async def checkout_runsteps(self, testrun):
+        """
+        checked out a run's steps so we can update them
+        :param testrun: <int> : The id of the test run
+        :return: <list of dicts> : The steps to be executed
+        """
+        await self.lock_testrun(testrun)
+        run = await self.ask_big(f"/testruns/{testrun}")
+        f = run["fields"]
+        if self.debug:
+            print(f"Retrieved testrun {testrun} with {len(f['testRunSteps'])} steps")
+        return f["testRunSteps"]
+
+    async def checkin_runsteps(self, testrun, steps, tester=None, resulttext=None):
+        """
+        after they have been checked out, update the test steps for a run and unlock
+        :param testrun: <int> : The id of the test run
+        :param steps: <list of dicts> : Array (for each step) of dicts, each step having fields "result" and "status"
+        :param tester: <int/str> : id or name of tester assigned to the run
+        :param resulttext: <string> : Rich text of any other info for test run
+        """
+        data = await self.ask_big(f"/testruns/{testrun}")
+        fields = data["fields"]
+        fields.pop("testRunStatus", None)
+        fields.pop("executionDate", None)
+        fields["testRunSteps"] = steps
+        if tester:
+            if type(tester) is str:
+                names = tester.split(" ")
+                tester = await self.find_user(names[0], " ".join(names[1:]))
+            fields["assignedTo"] = tester
+        if resulttext:
+            fields["actualResults"] = resulttext
+        response = await self.put(f"/testruns/{testrun}", {"fields": fields})
+        resp = await response.json(content_type=None)
+        await self.unlock_testrun(testrun)
+        if resp["meta"]["status"] == "Bad Request":
+            raise Exception(
+                f"checkin_runsteps on run {testrun} ERROR: {resp['meta']['message']}, ({len(steps)} steps)"
+            )
+        return resp
+
+    async def get_testruns(self, cycle):
+        """
+        Get all testruns for a test cycle
+        :param cycle: <int> : The id of the test run
+        :return: <list> : List of test runs
+        """
+        return await self.ask_big(f"/testcycles/{cycle}/testruns")
+
+    async def get_testrunsx(self, cycle):
+        """
+        Get all testruns for a test cycle, with the test case info
+        :param cycle: <int> : The id of the test run
+        :return: <list> : List of test runs with test case info
+        """
+        return await self.ask_big(
+            f"/testcycles/{cycle}/testruns",
+            field="tc",
+            args={"include": "data.fields.testCase"},
+        )
+
+    async def get_testgroups(self, plan):
+        """
+        Get all testgroups for a test plan
+        :param plan: <int> : The id of the test plan
+        :return: <dict> : Dict of test groups name:id
+        """
+        data = await self.ask_big(f"/testplans/{plan}/testgroups")
+        return {x["name"]: x["id"] for x in data}
+
+    async def get_testcycles(self, plan):
+        """
+        Get all testcycles for a test plan
+        :param plan: <int> : The id of the test plan
+        :return: <dict> : Dict of test cycles name:id
+        """
+        data = await self.ask_big(f"/testplans/{plan}/testcycles")
+        return {x["fields"]["name"]: x["id"] for x in data}
+
+    async def get_all_users(self, include_inactive=False):
+        """
+        Get all users in JAMA
+        :param include_inactive: <bool> : Include inactive users (defualt false)
+        :return: <dict> : Dict of users id:name
+        """
+        data = await self.ask_big("/users", args={"includeInactive": include_inactive})
+        return {x["id"]: f"{x['firstName']} {x['lastName']}" for x in data}
+
+    async def get_req_text(self, req_id):
+        """
+        Get rendered version of requirement text
+        :param req_id: <str> : Requirement identifier
+        :return: <list> : rendered text lines from requirement
+        """
+        results = await self.find_req_id(req_id)
+        if len(results) != 1:
+            print(f"Ambiguous/empty match for requirement {req_id}")
+            return []
+        return jamarest.html_to_lines(results[0]["fields"]["description"])
+
+    async def create_link(self, item, url, description):
+        """
+        Create link from item
+        :param item: <int> : JAMA ID of item
+        :param url: <str> : URL for link
+        :param description: <str> : Text of link
+        :return: <aiohttp response>
+        """
+        json = {"url": url, "description": description}
+        return await self.post(f"/items/{item}/links", json)
+
+    async def create_relationship(self, upstream, downstream, relationship_type=None):
+        """
+        Create a relationship between two items
+        :param upstream: <int> : JAMA ID of item
+        :param downstream: <int> : JAMA ID of item
+        :param relationship_type: <int> : JAMA ID of relationship type
+        :return: <dict> : decoded response
+        """
+        json = {"fromItem": upstream, "toItem": downstream}
+        if relationship_type:
+            json["relationshipType"] = relationship_type
+        resp = await (await self.post("/relationships", json)).json(content_type=None)
+        if resp["meta"]["status"] == "Bad Request":
+            raise Exception(f"create_relationship ERROR: {resp['meta']['message']}")
+        return resp
+
+    async def remove_testrun(self, testrun):
+        """
+        Delete a test run
+        :param testrun: <int> : The id of the test run
+        :return: <aiohttp response>
+        """
+        return await self._delete(f"/testruns/{testrun}")
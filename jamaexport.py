@@ -0,0 +1,248 @@
+"""
+Columnar export of JAMA filter, search and test run results
+Streams paged results a batch at a time into Parquet or Arrow files (needs pyarrow), or NumPy structured arrays
+(needs numpy), so a large export never sits fully in Python objects. Picklist, release and item type IDs are
+resolved through the client's lookup into categorical (dictionary encoded) columns.
+
+Usage:
+    export_filter_results(jam, "All requirements", "reqs.parquet", ["id", "documentKey", "fields.name", "fields.status"])
+    export_testruns(jam, cycles, "runs.arrow", ["id", "fields.testCase", "fields.testRunStatus", "modifiedDate"])
+Read back with pandas.read_parquet, pyarrow.ipc.open_stream or read_npy_batches.
+
+The MIT licence:
+Copyright (c) 2016-2019 Optos plc
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated documentation files (the "Software"), to deal in the Software without restriction, including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+import itertools
+import json
+
+# Fields whose values are JAMA IDs of picklist options, releases or item types, or a small set of strings
+CATEGORICAL = ("itemType", "fields.itemType", "fields.status", "fields.release", "fields.testRunStatus")
+
+
+class ArrowWriter:
+    """
+    Writes batches of columns to a Parquet file, or an Arrow IPC stream, as they come
+    """
+
+    def __init__(self, path, format="parquet"):
+        import pyarrow  # Imported here as only needed for exports
+
+        self.pyarrow = pyarrow
+        self.path = path
+        self.format = format
+        self.schema = None
+        self.writer = None
+
+    def write(self, columns, categorical=()):
+        """
+        :param columns: <dict> : Column name: list of values
+        :param categorical: <set of str> : Columns of strings to dictionary encode
+        """
+        pa = self.pyarrow
+        arrays = {}
+        for name, values in columns.items():
+            if name in categorical:
+                arrays[name] = pa.array(values, type=pa.string()).dictionary_encode()
+            else:
+                arrays[name] = pa.array(values)
+        table = pa.table(arrays)
+        if self.writer is None:
+            # Columns with no values in the first batch can't be typed yet, so assume strings
+            self.schema = pa.schema(
+                [f.with_type(pa.string()) if pa.types.is_null(f.type) else f for f in table.schema]
+            )
+            if self.format == "parquet":
+                import pyarrow.parquet
+
+                self.writer = pyarrow.parquet.ParquetWriter(self.path, self.schema)
+            else:
+                import pyarrow.ipc
+
+                self.writer = pyarrow.ipc.new_stream(self.path, self.schema)
+        self.writer.write_table(table.cast(self.schema))
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+
+class NumpyWriter:
+    """
+    Writes each batch of columns as a NumPy structured array, one after another in a .npy file.
+    Categorical columns are stored as int32 codes (-1 for none), with their categories and the
+    column names in a JSON file alongside (path + ".json").
+    """
+
+    def __init__(self, path):
+        import numpy  # Imported here as only needed for exports
+
+        self.numpy = numpy
+        self.path = path
+        self.file = open(path, "wb")
+        self.categories = {}  # Column name: dict of category: code
+        self.batches = 0
+
+    def _column(self, name, values, categorical):
+        np = self.numpy
+        if name in categorical:
+            codes = self.categories.setdefault(name, {})
+            return np.array([-1 if v is None else codes.setdefault(v, len(codes)) for v in values], dtype="i4")
+        present = [v for v in values if v is not None]
+        if present and all(type(v) is bool for v in present) and len(present) == len(values):
+            return np.array(values, dtype="?")
+        if present and all(type(v) in (int, float) for v in present):
+            if len(present) == len(values) and all(type(v) is int for v in present):
+                return np.array(values, dtype="i8")
+            return np.array([float("nan") if v is None else v for v in values], dtype="f8")
+        return np.array(["" if v is None else str(v) for v in values], dtype="U")
+
+    def write(self, columns, categorical=()):
+        """
+        :param columns: <dict> : Column name: list of values
+        :param categorical: <set of str> : Columns of strings to store as codes
+        """
+        np = self.numpy
+        arrays = [self._column(name, values, categorical) for name, values in columns.items()]
+        batch = np.empty(len(arrays[0]), dtype=[(name, a.dtype) for name, a in zip(columns, arrays)])
+        for name, a in zip(columns, arrays):
+            batch[name] = a
+        np.save(self.file, batch, allow_pickle=False)
+        self.batches += 1
+
+    def close(self):
+        self.file.close()
+        with open(self.path + ".json", "w") as f:
+            json.dump(
+                {
+                    "batches": self.batches,
+                    "categories": {name: list(codes) for name, codes in self.categories.items()},
+                },
+                f,
+            )
+
+
+def read_npy_batches(path):
+    """
+    Read back an export written by NumpyWriter
+    :param path: <str> : .npy file
+    :return: <tuple> : list of structured arrays, one per batch, and dict of column name: list of categories
+    """
+    import numpy
+
+    with open(path + ".json") as f:
+        info = json.load(f)
+    with open(path, "rb") as f:
+        batches = [numpy.load(f, allow_pickle=False) for _ in range(info["batches"])]
+    return batches, info["categories"]
+
+
+def open_writer(path, format=None):
+    """
+    :param path: <str> : File to write
+    :param format: <str> : "parquet", "arrow" or "npy" (default from path's extension, else parquet if pyarrow is
+        installed, else npy)
+    :return: <ArrowWriter/NumpyWriter>
+    """
+    if format is None:
+        extension = path.rsplit(".", 1)[-1].lower()
+        if extension in ("parquet", "arrow", "npy"):
+            format = extension
+        else:
+            try:
+                import pyarrow
+                format = "parquet"
+            except ImportError:
+                format = "npy"
+    if format in ("parquet", "arrow"):
+        return ArrowWriter(path, format)
+    if format == "npy":
+        return NumpyWriter(path)
+    raise Exception(f"Unknown export format {format}")
+
+
+def export_records(records, path, lookup=None, categorical=CATEGORICAL, batch_size=10000, format=None):
+    """
+    Write records, as from iter_big with fields, to a columnar file a batch at a time
+    :param records: <iterable of records> : Results as compact records (see jamarest.record_type)
+    :param path: <str> : File to write
+    :param lookup: <dict> : Lookup table to resolve categorical IDs to names, e.g. the client's lookup (default none)
+    :param categorical: <tuple of str> : Fields to resolve through lookup into categorical columns, if exported
+    :param batch_size: <int> : Rows to hold before writing them out
+    :param format: <str> : "parquet", "arrow" or "npy" (default from path, see open_writer)
+    :return: <int> : Number of rows written
+    """
+    records = iter(records)
+    writer = open_writer(path, format)
+    rows = 0
+    try:
+        while True:
+            batch = list(itertools.islice(records, batch_size))
+            if not batch:
+                break
+            names = batch[0]._fields
+            categories = {
+                name for name, field in zip(names, type(batch[0])._dotted) if field in categorical
+            }
+            columns = {}
+            for name, values in zip(names, zip(*batch)):
+                if name in categories:
+                    values = [None if v is None else str(lookup.get(v, v) if lookup else v) for v in values]
+                columns[name] = list(values)
+            writer.write(columns, categories)
+            rows += len(batch)
+    finally:
+        writer.close()
+    return rows
+
+
+def export_filter_results(jama, filter_id, path, fields, project=None, resolve=True, **kwargs):
+    """
+    Export the items from a JAMA filter
+    :param jama: <jama> : Client to query
+    :param filter_id: <int/str> JAMA Filter name or ID
+    :param path: <str> : File to write
+    :param fields: <list of str> : Fields to export, dotted for nested fields, e.g. ["id", "fields.status"]
+    :param project: <int> : JAMA Project ID (defaults to set project)
+    :param resolve: <bool> : Resolve categorical IDs through the client's lookup (default True)
+    :param kwargs: : Passed to export_records
+    :return: <int> : Number of rows written
+    """
+    records = jama.iter_filter_results(filter_id, project, fields=fields)
+    return export_records(records, path, jama.lookup if resolve else None, **kwargs)
+
+
+def export_search(jama, contains, path, fields, item_type=None, resolve=True, **kwargs):
+    """
+    Export the items that match a string
+    :param jama: <jama> : Client to query
+    :param contains: <string> : String to search for within items
+    :param path: <str> : File to write
+    :param fields: <list of str> : Fields to export, dotted for nested fields, e.g. ["id", "fields.status"]
+    :param item_type: <int/string> : The type of item to search for (default: all)
+    :param resolve: <bool> : Resolve categorical IDs through the client's lookup (default True)
+    :param kwargs: : Passed to export_records
+    :return: <int> : Number of rows written
+    """
+    records = jama.iter_search(contains, item_type, fields=fields)
+    return export_records(records, path, jama.lookup if resolve else None, **kwargs)
+
+
+def export_testruns(jama, cycles, path, fields, resolve=True, **kwargs):
+    """
+    Export the test runs of one or more test cycles
+    :param jama: <jama> : Client to query
+    :param cycles: <int/list of ints> : Test cycle ID(s)
+    :param path: <str> : File to write
+    :param fields: <list of str> : Fields to export, dotted for nested fields, e.g. ["id", "fields.testRunStatus"]
+    :param resolve: <bool> : Resolve categorical IDs through the client's lookup (default True)
+    :param kwargs: : Passed to export_records
+    :return: <int> : Number of rows written
+    """
+    if type(cycles) is int:
+        cycles = [cycles]
+    records = itertools.chain.from_iterable(jama.iter_testruns(cycle, fields=fields) for cycle in cycles)
+    return export_records(records, path, jama.lookup if resolve else None, **kwargs)
@@ -0,0 +1,230 @@
+"""
+Local full-text index over the names and text of a JAMA project's items, in SQLite FTS5
+Built from streamed /abstractitems pages, then kept up to date by asking for items by lastActivityDate, so that
+thousands of term, phrase and prefix queries can be answered without an API call each.
+
+Usage:
+    index = JamaIndex(jama(base_url, username, password), "index.db", "PROJ")
+    index.sync()  # Full build the first time, then only items with activity since
+    index.find_phrase("shall display the image")  # ["PROJ-REQ-12", ...]
+    index.find_phrases(phrases)  # {phrase: [documentKeys]} for each of many phrases
+
+The MIT licence:
+Copyright (c) 2016-2019 Optos plc
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated documentation files (the "Software"), to deal in the Software without restriction, including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+import html
+import re
+import sqlite3
+from datetime import datetime, timezone
+
+SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS items USING fts5 (
+    documentKey UNINDEXED,
+    itemType UNINDEXED,
+    name,
+    text,
+    tokenize = 'unicode61 remove_diacritics 2',
+    prefix = '2 3 4'
+);
+CREATE TABLE IF NOT EXISTS state (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+FIELDS = ["id", "documentKey", "itemType", "fields.name", "fields.description"]
+
+
+def utcnow():
+    return datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def html_to_text(contents_string):
+    """
+    Cheap rendering of rich text from a JAMA field as plain text, keeping line breaks, for indexing
+    :param contents_string: <str> : HTML of the field
+    :return: <str>
+    """
+    if not contents_string:
+        return ""
+    text = re.sub(r"<br\s*/?>|</(p|div|li|tr|h\d)>", "\n", contents_string, flags=re.IGNORECASE)
+    text = html.unescape(re.sub(r"<[^>]*>", "", text))
+    return "\n".join(line.rstrip() for line in text.split("\n")).strip("\n")
+
+
+def quote(term):
+    """
+    :param term: <str> : Words to match as a phrase
+    :return: <str> : FTS5 query string for it
+    """
+    return '"' + term.replace('"', '""') + '"'
+
+
+class JamaIndex:
+    def __init__(self, jama, path=":memory:", project=None):
+        """
+        :param jama: <jama> : Client to index from
+        :param path: <str> : SQLite database file (default in memory)
+        :param project: <int/str> : Project to index, defaults to the client's set project
+        """
+        self.jama = jama
+        if not project:
+            project = jama.project_id
+        elif type(project) is str:
+            project = jama.get_project_id(project)
+        if not project:
+            raise Exception("JAMA project not set")
+        self.project = project
+        self.db = sqlite3.connect(path)
+        self.db.executescript(SCHEMA)
+
+    def close(self):
+        self.db.close()
+
+    def _get_state(self, key):
+        row = self.db.execute("SELECT value FROM state WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_state(self, key, value):
+        self.db.execute("INSERT OR REPLACE INTO state VALUES (?, ?)", (key, str(value)))
+
+    @property
+    def high_water_mark(self):
+        """
+        Time (UTC ISO string) up to which item activity has been indexed, None if never built
+        """
+        if self._get_state("project") != str(self.project):
+            return None
+        return self._get_state("high_water_mark")
+
+    def _store(self, records):
+        for record in records:
+            self.db.execute("DELETE FROM items WHERE rowid = ?", (record.id,))
+            self.db.execute(
+                "INSERT INTO items (rowid, documentKey, itemType, name, text) VALUES (?, ?, ?, ?, ?)",
+                (record.id, record.documentKey, record.itemType, record.name or "", html_to_text(record.description)),
+            )
+
+    def build(self):
+        """
+        Index every item in the project, into an emptied index
+        """
+        started = utcnow()
+        with self.db:
+            self.db.execute("DELETE FROM items")
+            self.db.execute("DELETE FROM state")
+            self._store(self.jama.iter_big("/abstractitems", {"project": self.project}, readahead=True, fields=FIELDS))
+            self._set_state("project", self.project)
+            self._set_state("high_water_mark", started)
+        self.db.execute("INSERT INTO items (items) VALUES ('optimize')")
+        self.db.commit()
+
+    def update(self):
+        """
+        Reindex items with activity since the high water mark, and drop items deleted since
+        :return: <int> : Number of items reindexed or dropped
+        """
+        since = self.high_water_mark
+        if not since:
+            raise Exception("Index has not been built yet")
+        started = utcnow()
+        changed = self.jama.ask_big(
+            "/abstractitems",
+            doseq=True,
+            args={"project": self.project, "lastActivityDate": [since, started]},
+            fields=FIELDS,
+        )
+        deleted = {
+            act["item"]
+            for act in self.jama.ask_big(
+                "/activities",
+                doseq=True,
+                args={"project": self.project, "date": [since, started], "eventType": "DELETE"},
+            )
+            if "item" in act and act.get("objectType") == "ITEM"
+        }
+        deleted -= {record.id for record in changed}  # Deleted then recreated
+        with self.db:
+            self.db.executemany("DELETE FROM items WHERE rowid = ?", ((item,) for item in deleted))
+            self._store(changed)
+            self._set_state("high_water_mark", started)
+        return len(changed) + len(deleted)
+
+    def sync(self):
+        """
+        Bring the index up to date: a full build if never built (or built for another project), else incremental
+        """
+        if self.high_water_mark:
+            self.update()
+        else:
+            self.build()
+
+    def search(self, query, item_type=None, limit=None):
+        """
+        Find items matching an FTS5 query, e.g. 'image AND (display OR show)', '"whole phrase"', 'pref*',
+        or 'name: laser' for just item names
+        :param query: <str> : FTS5 query
+        :param item_type: <int/string> : The type of item to search for (default: all)
+        :param limit: <int> : Most results to return (default all)
+        :return: <list of str> : documentKeys of matching items, best match first
+        """
+        if type(item_type) is str:
+            item_type = self.jama.lookup[item_type]
+        sql = "SELECT documentKey FROM items WHERE items MATCH ?"
+        args = [query]
+        if item_type:
+            sql += " AND itemType = ?"
+            args.append(item_type)
+        sql += " ORDER BY rank"
+        if limit:
+            sql += " LIMIT ?"
+            args.append(limit)
+        return [row[0] for row in self.db.execute(sql, args)]
+
+    def find_terms(self, terms, item_type=None):
+        """
+        :param terms: <list of str> : Words that must all appear, in any order
+        :param item_type: <int/string> : The type of item to search for (default: all)
+        :return: <list of str> : documentKeys of matching items
+        """
+        return self.search(" AND ".join(quote(term) for term in terms), item_type)
+
+    def find_phrase(self, phrase, item_type=None):
+        """
+        :param phrase: <str> : Words that must appear together, in order
+        :param item_type: <int/string> : The type of item to search for (default: all)
+        :return: <list of str> : documentKeys of matching items
+        """
+        return self.search(quote(phrase), item_type)
+
+    def find_prefix(self, prefix, item_type=None):
+        """
+        :param prefix: <str> : Start of a word
+        :param item_type: <int/string> : The type of item to search for (default: all)
+        :return: <list of str> : documentKeys of items with a word starting with prefix
+        """
+        return self.search(quote(prefix) + "*", item_type)
+
+    def find_phrases(self, phrases, item_type=None):
+        """
+        :param phrases: <list of str> : Phrases to look for
+        :param item_type: <int/string> : The type of item to search for (default: all)
+        :return: <dict> : phrase: list of documentKeys of items containing it
+        """
+        return {phrase: self.find_phrase(phrase, item_type) for phrase in phrases}
+
+    def get_req_text(self, req_id):
+        """
+        Get indexed version of requirement text
+        :param req_id: <str> : Requirement identifier
+        :return: <list> : text lines from requirement
+        """
+        rows = self.db.execute("SELECT text FROM items WHERE documentKey = ?", (req_id,)).fetchall()
+        if len(rows) != 1:
+            print(f"Ambiguous/empty match for requirement {req_id}")
+            return []
+        return rows[0][0].split("\n")
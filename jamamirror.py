@@ -0,0 +1,283 @@
+"""
+Local mirror of a JAMA project in SQLite, kept up to date from the project's activity stream
+
+Usage:
+    mirror = JamaMirror(jama(base_url, username, password), "project.db", "PROJ")
+    mirror.sync()  # Full pull the first time, then only what /activities says has changed
+    mirror.find_req_id("PROJ-REQ-123")
+
+The MIT licence:
+Copyright (c) 2016-2019 Optos plc
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated documentation files (the "Software"), to deal in the Software without restriction, including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+import json
+import sqlite3
+from datetime import datetime, timezone
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS items (
+    id INTEGER PRIMARY KEY,
+    documentKey TEXT,
+    itemType INTEGER,
+    name TEXT,
+    description TEXT,
+    modifiedDate TEXT,
+    json TEXT
+);
+CREATE INDEX IF NOT EXISTS items_documentKey ON items (documentKey);
+CREATE TABLE IF NOT EXISTS relationships (
+    id INTEGER PRIMARY KEY,
+    fromItem INTEGER,
+    toItem INTEGER,
+    relationshipType INTEGER,
+    json TEXT
+);
+CREATE INDEX IF NOT EXISTS relationships_fromItem ON relationships (fromItem);
+CREATE INDEX IF NOT EXISTS relationships_toItem ON relationships (toItem);
+CREATE TABLE IF NOT EXISTS testruns (
+    id INTEGER PRIMARY KEY,
+    testCycle INTEGER,
+    testCase INTEGER,
+    status TEXT,
+    json TEXT
+);
+CREATE INDEX IF NOT EXISTS testruns_testCycle ON testruns (testCycle);
+CREATE TABLE IF NOT EXISTS state (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+def utcnow():
+    return datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+class JamaMirror:
+    def __init__(self, jama, path, project=None):
+        """
+        :param jama: <jama> : Client to sync from
+        :param path: <str> : SQLite database file
+        :param project: <int/str> : Project to mirror, defaults to the client's set project
+        """
+        self.jama = jama
+        if not project:
+            project = jama.project_id
+        elif type(project) is str:
+            project = jama.get_project_id(project)
+        if not project:
+            raise Exception("JAMA project not set")
+        self.project = project
+        self.db = sqlite3.connect(path)
+        self.db.executescript(SCHEMA)
+
+    def close(self):
+        self.db.close()
+
+    def _get_state(self, key):
+        row = self.db.execute("SELECT value FROM state WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_state(self, key, value):
+        self.db.execute("INSERT OR REPLACE INTO state VALUES (?, ?)", (key, str(value)))
+
+    @property
+    def high_water_mark(self):
+        """
+        Time (UTC ISO string) up to which the mirror has applied the project's activities, None if never synced
+        """
+        if self._get_state("project") != str(self.project):
+            return None
+        return self._get_state("high_water_mark")
+
+    def _store_items(self, items):
+        self.db.executemany(
+            "INSERT OR REPLACE INTO items VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (
+                (
+                    x["id"],
+                    x.get("documentKey") or x.get("fields", {}).get("documentKey"),
+                    x.get("itemType"),
+                    x.get("fields", {}).get("name"),
+                    x.get("fields", {}).get("description"),
+                    x.get("modifiedDate"),
+                    json.dumps(x),
+                )
+                for x in items
+            ),
+        )
+
+    def _store_relationships(self, relationships):
+        self.db.executemany(
+            "INSERT OR REPLACE INTO relationships VALUES (?, ?, ?, ?, ?)",
+            (
+                (x["id"], x["fromItem"], x["toItem"], x.get("relationshipType"), json.dumps(x))
+                for x in relationships
+            ),
+        )
+
+    def _store_testruns(self, testruns):
+        self.db.executemany(
+            "INSERT OR REPLACE INTO testruns VALUES (?, ?, ?, ?, ?)",
+            (
+                (
+                    x["id"],
+                    x.get("fields", {}).get("testCycle"),
+                    x.get("fields", {}).get("testCase"),
+                    x.get("fields", {}).get("testRunStatus"),
+                    json.dumps(x),
+                )
+                for x in testruns
+            ),
+        )
+
+    def full_sync(self):
+        """
+        Pull every item, relationship and test run in the project into an emptied store
+        """
+        started = utcnow()
+        with self.db:
+            for table in ("items", "relationships", "testruns"):
+                self.db.execute(f"DELETE FROM {table}")
+            self._store_items(self.jama.iter_big("/abstractitems", {"project": self.project}, readahead=True))
+            self._store_relationships(self.jama.iter_big("/relationships", {"project": self.project}, readahead=True))
+            for plan in self.jama.iter_big("/testplans", {"project": self.project}):
+                for cycle in self.jama.get_plancycles(plan["id"]):
+                    self._store_testruns(self.jama.iter_testruns(cycle["id"]))
+            self._set_state("project", self.project)
+            self._set_state("high_water_mark", started)
+
+    def update(self):
+        """
+        Apply the project's activities since the high water mark, refetching each touched item or test run once
+        :return: <int> : Number of activities applied
+        """
+        since = self.high_water_mark
+        if not since:
+            raise Exception("Mirror has not been fully synced yet")
+        started = utcnow()
+        activities = self.jama.ask_big(
+            "/activities",
+            doseq=True,
+            args={"project": self.project, "date": [since, started]},
+        )
+        items = {}
+        testruns = {}
+        for act in sorted(activities, key=lambda x: x.get("date", "")):
+            if "item" not in act:
+                continue
+            if act.get("objectType") == "TEST_RUN":
+                testruns[act["item"]] = act.get("eventType")
+            else:
+                # Deleting a comment, attachment or relationship changes the item but doesn't delete it
+                items[act["item"]] = act.get("objectType") == "ITEM" and act.get("eventType") == "DELETE"
+        with self.db:
+            for item, deleted in items.items():
+                self._refresh_item(item, deleted)
+            for testrun, event in testruns.items():
+                self.db.execute("DELETE FROM testruns WHERE id = ?", (testrun,))
+                if event != "DELETE":
+                    self._store_testruns([self.jama.ask_big(f"/testruns/{testrun}")])
+            self._set_state("high_water_mark", started)
+        return len(activities)
+
+    def _refresh_item(self, item, deleted=False):
+        """
+        Replace an item and its relationships in the store with the server's current versions
+        :param item: <int> : JAMA ID of item
+        :param deleted: <bool> : Item has been deleted, so just remove it
+        """
+        self.db.execute("DELETE FROM items WHERE id = ?", (item,))
+        self.db.execute("DELETE FROM relationships WHERE fromItem = ? OR toItem = ?", (item, item))
+        if deleted:
+            return
+        try:
+            self._store_items([self.jama.ask_big(f"/abstractitems/{item}")])
+        except Exception as e:
+            if "Non-success code 404" not in str(e):
+                raise
+            return  # Deleted since the activity
+        self._store_relationships(self.jama.iter_big(f"/items/{item}/downstreamrelationships"))
+        self._store_relationships(self.jama.iter_big(f"/items/{item}/upstreamrelationships"))
+
+    def sync(self):
+        """
+        Bring the mirror up to date: a full pull if never synced (or synced for another project), else incremental
+        """
+        if self.high_water_mark:
+            self.update()
+        else:
+            self.full_sync()
+
+    def _items(self, where, args):
+        return [json.loads(row[0]) for row in self.db.execute(f"SELECT json FROM items WHERE {where} ORDER BY id", args)]
+
+    def find_req_id(self, req_id):
+        """
+        For a JAMA requirement text ID, return matches
+        :param req_id: <str>
+        :return: <list>
+        """
+        return self._items("documentKey = ?", (req_id,))
+
+    def find_uniqid(self, uniqid):
+        """
+        Given JAMA API int id, return the JAMA string ID
+        :param uniqid: <int> : Item to find
+        :return: <str> : JAMA string ID
+        """
+        row = self.db.execute("SELECT documentKey FROM items WHERE id = ?", (uniqid,)).fetchone()
+        return row[0] if row else None
+
+    def get_downstream_ids(self, item):
+        """
+        Given an item ID, return its downstream related items
+        :param item: <int> : Item JAMA ID
+        :return: <dict> : item's downstream requirement IDs, keyed by relationship ID
+        """
+        rows = self.db.execute("SELECT id, toItem FROM relationships WHERE fromItem = ? ORDER BY id", (item,))
+        return dict(rows)
+
+    def get_upstream_ids(self, item, field="id"):
+        """
+        Given an item ID, return its upstream related items
+        :param item: <int> : Item JAMA ID
+        :param field: <str> : Field to return, default is ID (JAMA ID)
+        :return: <list> : item's upstream requirements
+        """
+        rows = self.db.execute(
+            "SELECT i.id, i.json FROM relationships r JOIN items i ON i.id = r.fromItem WHERE r.toItem = ? ORDER BY r.id",
+            (item,),
+        )
+        if field == "id":
+            return [row[0] for row in rows]
+        return [json.loads(row[1])[field] for row in rows]
+
+    def search(self, contains, item_type=None):
+        """
+        Find items whose name or description contains a string
+        :param contains: <string> : String to search for within items
+        :param item_type: <int/string> : The type of item to search for (default: all)
+        :return: <list of dicts> : search results
+        """
+        if type(item_type) is str:
+            item_type = self.jama.lookup[item_type]
+        pattern = "%" + contains.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+        where = "(name LIKE ? ESCAPE '\\' OR description LIKE ? ESCAPE '\\')"
+        args = [pattern, pattern]
+        if item_type:
+            where += " AND itemType = ?"
+            args.append(item_type)
+        return self._items(where, args)
+
+    def get_testruns(self, cycle):
+        """
+        Get all testruns for a test cycle
+        :param cycle: <int> : The id of the test cycle
+        :return: <list> : List of test runs
+        """
+        rows = self.db.execute("SELECT json FROM testruns WHERE testCycle = ? ORDER BY id", (cycle,))
+        return [json.loads(row[0]) for row in rows]
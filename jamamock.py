@@ -0,0 +1,408 @@
+"""
+Local stand-in for a JAMA REST server, for benchmarking and trying out jamarest without touching a real JAMA instance.
+Emulates the endpoints jamarest uses with generated data: pagination with startAt/maxResults/pageInfo, linked includes,
+relationships, filters, test plans, cycles and runs with locks, activities, and 429 throttling with Retry-After.
+
+Usage:
+    server = JamaMockServer(items=5000, latency=0.02, rate_limit=20)
+    server.start()
+    jam = jama(server.base_url, "user", "password")
+    ...
+    server.stop()
+
+The MIT licence:
+Copyright (c) 2016-2019 Optos plc
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated documentation files (the "Software"), to deal in the Software without restriction, including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+import collections
+import json
+import re
+import threading
+import time
+import urllib.parse
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+PROJECT = 1
+REQUIREMENT = 20
+TEST_CASE = 26
+STATUSES = {100: "Draft", 101: "Approved", 102: "Rejected"}
+USERS = [(1, "Ann", "Admin"), (2, "Bob", "Tester"), (3, "Cat", "Reviewer")]
+MAX_RESULTS = 50
+
+
+class JamaMockServer:
+    def __init__(self, items=1000, testruns=200, activities_per_day=5, latency=0.0, rate_limit=None, host="127.0.0.1", port=0):
+        """
+        :param items: <int> : Number of requirements to generate; as many test cases are generated as a fifth of this
+        :param testruns: <int> : Number of test runs in the test cycle
+        :param activities_per_day: <int> : Activity events generated for each day of the last year
+        :param latency: <float> : Seconds to delay each response by
+        :param rate_limit: <float> : Requests per second allowed before answering 429 (default unlimited)
+        :param host: <str> : Address to listen on
+        :param port: <int> : Port to listen on, default any free port
+        """
+        self.latency = latency
+        self.rate_limit = rate_limit
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.throttled = 0
+        self.window = [0.0, 0]  # Start of current one second window, requests in it
+        self.next_id = 1000000
+        self._generate(items, testruns, activities_per_day)
+        self.server = ThreadingHTTPServer((host, port), self._handler())
+        self.server.daemon_threads = True
+        self.thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/rest/latest"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _generate(self, items, testruns, activities_per_day):
+        self.items = {}
+        for i in range(1, items + 1):
+            self._add_item(i, REQUIREMENT, f"REQ-{i}", f"Requirement {i}", f"<p>The system shall do thing {i}.</p>")
+        tests = []
+        for i in range(items + 1, items + 1 + max(1, items // 5)):
+            self._add_item(i, TEST_CASE, f"TC-{i}", f"Test case {i}", f"<p>Check thing {i}</p>")
+            tests.append(i)
+        # Requirements form a binary tree, and each leaf-ish requirement is verified by a test case
+        self.relationships = {}
+        self.by_from = collections.defaultdict(dict)  # Item id: {relationship id: relationship}
+        self.by_to = collections.defaultdict(dict)
+        for i in range(2, items + 1):
+            self._add_relationship(i // 2, i, 5)
+        for n, tc in enumerate(tests):
+            self._add_relationship(items - n, tc, 6)
+        self.filters = {1: {"id": 1, "name": "All requirements", "project": PROJECT}}
+        self.testplans = {1: {"id": 1, "project": PROJECT, "fields": {"name": "Plan"}}}
+        self.testgroups = {1: {"id": 1, "name": "Default", "testPlan": 1, "testCases": list(tests)}}
+        self.testcycles = {1: {"id": 1, "fields": {"name": "Cycle", "testPlan": 1}}}
+        self.testruns = {}
+        self.locks = {}
+        for n in range(testruns):
+            run_id = 500000 + n
+            self.testruns[run_id] = {
+                "id": run_id,
+                "fields": {
+                    "name": f"Run {n}",
+                    "testCycle": 1,
+                    "testCase": tests[n % len(tests)],
+                    "testRunStatus": ("PASSED", "FAILED", "NOT_RUN")[n % 3],
+                    "assignedTo": USERS[n % len(USERS)][0],
+                    "executionDate": "2026-01-01",
+                    "testRunSteps": [{"action": "Do it", "expectedResult": "Done", "notes": ""}],
+                },
+            }
+        self.activities = []
+        start = date.today() - timedelta(days=365)
+        for day in range(365):
+            isodate = (start + timedelta(days=day)).isoformat()
+            for n in range(activities_per_day):
+                self.activities.append(
+                    {
+                        "id": len(self.activities) + 1,
+                        "date": f"{isodate}T{10 + n % 8:02}:00:00.000+0000",
+                        "user": USERS[(day + n) % len(USERS)][0],
+                        "project": PROJECT,
+                        "item": 1 + (day * activities_per_day + n) % items,
+                        "objectType": "ITEM",
+                        "eventType": ("UPDATE", "CREATE", "DELETE", "UPDATE")[n % 4],
+                    }
+                )
+
+    def _add_item(self, item_id, item_type, key, name, description):
+        self.items[item_id] = {
+            "id": item_id,
+            "documentKey": key,
+            "project": PROJECT,
+            "itemType": item_type,
+            "modifiedDate": "2026-01-01T00:00:00.000+0000",
+            "lastActivityDate": "2026-01-01T00:00:00.000+0000",
+            "fields": {"documentKey": key, "name": name, "description": description, "status": 100 + item_id % 3},
+        }
+
+    def _add_relationship(self, upstream, downstream, rtype=None):
+        with self.lock:
+            self.next_id += 1
+            rel = {"id": self.next_id, "fromItem": upstream, "toItem": downstream, "relationshipType": rtype}
+            self.relationships[rel["id"]] = rel
+            self.by_from[upstream][rel["id"]] = rel
+            self.by_to[downstream][rel["id"]] = rel
+        return rel
+
+    def _remove_relationship(self, rel_id):
+        with self.lock:
+            rel = self.relationships.pop(rel_id)
+            del self.by_from[rel["fromItem"]][rel_id]
+            del self.by_to[rel["toItem"]][rel_id]
+
+    def _new_id(self):
+        with self.lock:
+            self.next_id += 1
+            return self.next_id
+
+    def _throttle(self):
+        """
+        :return: <bool> : True if this request is over the rate limit
+        """
+        with self.lock:
+            self.requests += 1
+            if not self.rate_limit:
+                return False
+            now = time.monotonic()
+            if now - self.window[0] >= 1.0:
+                self.window = [now, 0]
+            self.window[1] += 1
+            if self.window[1] > self.rate_limit:
+                self.throttled += 1
+                return True
+            return False
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args):
+                pass
+
+            def _reply(self, code, body=None, headers=None):
+                data = json.dumps(body).encode() if body is not None else b""
+                self.send_response(code)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _handle(self, method):
+                if server.latency:
+                    time.sleep(server.latency)
+                if server._throttle():
+                    return self._reply(429, {"meta": {"status": "Too Many Requests"}}, {"Retry-After": "1"})
+                url = urllib.parse.urlsplit(self.path)
+                path = re.sub("^/rest/[^/]+", "", url.path).rstrip("/")
+                query = urllib.parse.parse_qs(url.query)
+                length = int(self.headers.get("Content-Length") or 0)
+                body = json.loads(self.rfile.read(length)) if length else None
+                try:
+                    code, reply = server.route(method, path, query, body, self.headers)
+                except KeyError:
+                    code, reply = 404, {"meta": {"status": "Not Found", "message": f"{path} not found"}}
+                self._reply(code, reply)
+
+            def do_GET(self):
+                self._handle("GET")
+
+            def do_PUT(self):
+                self._handle("PUT")
+
+            def do_POST(self):
+                self._handle("POST")
+
+            def do_DELETE(self):
+                self._handle("DELETE")
+
+        return Handler
+
+    @staticmethod
+    def page(results, query, linked=None):
+        """
+        One page of results, as JAMA would return it
+        :param results: <list> : All results
+        :param query: <dict> : Parsed query string, for startAt and maxResults
+        :param linked: <dict> : id: object for each result's linked objects, when asked to include them
+        :return: <tuple> : status code, response
+        """
+        start_at = int(query.get("startAt", ["0"])[0])
+        max_results = min(MAX_RESULTS, int(query.get("maxResults", ["20"])[0]))
+        data = results[start_at : start_at + max_results]
+        reply = {
+            "meta": {
+                "status": "OK",
+                "pageInfo": {"startIndex": start_at, "resultCount": len(data), "totalResults": len(results)},
+            },
+            "data": data,
+        }
+        if linked is not None and "include" in query:
+            reply["linked"] = {"items": {str(k): v for k, v in linked(data).items()}}
+        return 200, reply
+
+    @staticmethod
+    def single(data):
+        return 200, {"meta": {"status": "OK"}, "data": data}
+
+    @staticmethod
+    def created(new_id):
+        return 201, {"meta": {"status": "Created", "id": new_id}}
+
+    def route(self, method, path, query, body, headers):
+        """
+        Answer one request
+        :return: <tuple> : status code, response. Raises KeyError for unknown resources.
+        """
+        parts = path.strip("/").split("/")
+        ids = [int(x) for x in parts if x.isdigit()]
+        items = self.items
+        if method == "GET":
+            if path == "/projects":
+                return self.page([{"id": PROJECT, "projectKey": "MOCK", "fields": {"name": "Mock project"}}], query)
+            if path == "/picklists":
+                return self.page([{"id": 1, "name": "Status"}], query)
+            if path == "/picklists/1/options":
+                return self.page([{"id": k, "name": v} for k, v in STATUSES.items()], query)
+            if path == "/itemtypes":
+                return self.page([{"id": REQUIREMENT, "display": "Requirement"}, {"id": TEST_CASE, "display": "Test Case"}], query)
+            if path == "/releases":
+                return self.page([{"id": 9000, "name": "Release 1"}], query)
+            if path == "/users":
+                users = [{"id": i, "firstName": f, "lastName": l} for i, f, l in USERS]
+                if "firstName" in query:
+                    users = [x for x in users if x["firstName"] == query["firstName"][0] and x["lastName"] == query.get("lastName", [""])[0]]
+                return self.page(users, query)
+            if path == "/abstractitems":
+                results = list(items.values())
+                if "documentKey" in query:
+                    keys = set(query["documentKey"])
+                    results = [x for x in results if x["documentKey"] in keys]
+                if "itemType" in query:
+                    results = [x for x in results if str(x["itemType"]) in query["itemType"]]
+                if "contains" in query:
+                    words = query["contains"]
+                    results = [x for x in results if any(w in x["fields"]["name"] or w in x["fields"]["description"] for w in words)]
+                if "lastActivityDate" in query:
+                    since = query["lastActivityDate"][0]
+                    results = [x for x in results if x["lastActivityDate"] >= since]
+                return self.page(results, query)
+            if parts[0] in ("abstractitems", "items") and len(parts) == 2:
+                return self.single(items[ids[0]])
+            if parts[0] == "items" and len(parts) == 3:
+                item = ids[0]
+                if item not in items:
+                    raise KeyError(item)
+                downstream = sorted(self.by_from[item].values(), key=lambda x: x["id"])
+                upstream = sorted(self.by_to[item].values(), key=lambda x: x["id"])
+                ends = lambda data: {end: items[end] for x in data for end in (x["fromItem"], x["toItem"])}
+                if parts[2] == "downstreamrelationships":
+                    return self.page(downstream, query, ends)
+                if parts[2] == "upstreamrelationships":
+                    return self.page(upstream, query, ends)
+                if parts[2] == "downstreamrelated":
+                    return self.page([items[x["toItem"]] for x in downstream], query)
+                if parts[2] == "upstreamrelated":
+                    return self.page([items[x["fromItem"]] for x in upstream], query)
+                if parts[2] in ("synceditems", "tags", "links"):
+                    return self.page([], query)
+            if path == "/relationships":
+                return self.page(list(self.relationships.values()), query)  # Kept in id order
+            if path == "/filters":
+                return self.page(list(self.filters.values()), query)
+            if parts[0] == "filters" and parts[-1] == "results":
+                self.filters[ids[0]]
+                return self.page([x for x in items.values() if x["itemType"] == REQUIREMENT], query)
+            if path == "/testplans":
+                return self.page(list(self.testplans.values()), query)
+            if parts[0] == "testplans" and parts[-1] == "testcycles":
+                return self.page([x for x in self.testcycles.values() if x["fields"]["testPlan"] == ids[0]], query)
+            if parts[0] == "testplans" and parts[-1] == "testgroups":
+                return self.page([{"id": x["id"], "name": x["name"]} for x in self.testgroups.values() if x["testPlan"] == ids[0]], query)
+            if parts[0] == "testplans" and parts[-1] == "testcases":
+                return self.page([items[x] for x in self.testgroups[ids[1]]["testCases"]], query)
+            if parts[0] == "testcycles" and parts[-1] == "testruns":
+                self.testcycles[ids[0]]
+                runs = [x for x in self.testruns.values() if x["fields"]["testCycle"] == ids[0]]
+                return self.page(runs, query, lambda data: {x["fields"]["testCase"]: items[x["fields"]["testCase"]] for x in data})
+            if parts[0] == "testruns" and parts[-1] == "lock":
+                self.testruns[ids[0]]
+                return self.single({"locked": ids[0] in self.locks, "lastLockedBy": self.locks.get(ids[0])})
+            if parts[0] == "testruns":
+                return self.single(self.testruns[ids[0]])
+            if path == "/activities":
+                found = self.activities
+                if "date" in query:
+                    first, last = (query["date"] + query["date"])[:2]
+                    first, last = first[:10], last[:10]
+                    found = [x for x in found if first <= x["date"][:10] <= last]
+                if "eventType" in query:
+                    found = [x for x in found if x["eventType"] in query["eventType"]]
+                return self.page(found, query)
+        if method == "PUT":
+            if parts[0] == "testruns" and parts[-1] == "lock":
+                self.testruns[ids[0]]
+                user = headers.get("Authorization", "")
+                with self.lock:
+                    if body.get("locked"):
+                        if self.locks.get(ids[0], user) != user:
+                            return 409, {"meta": {"status": "Conflict", "message": "Test run locked by another user"}}
+                        self.locks[ids[0]] = user
+                    else:
+                        self.locks.pop(ids[0], None)
+                return 200, {"meta": {"status": "OK"}}
+            if parts[0] == "testruns":
+                run = self.testruns[ids[0]]
+                run["fields"].update(body["fields"])
+                return 200, {"meta": {"status": "OK"}}
+            if parts[0] == "testcycles":
+                self.testcycles[ids[0]]["fields"].update(body.get("fields", {}))
+                return 200, {"meta": {"status": "OK"}}
+        if method == "POST":
+            if path == "/items":
+                new_id = self._new_id()
+                fields = body["fields"]
+                self._add_item(new_id, body["itemType"], f"TC-{new_id}", fields["name"], fields.get("description") or "")
+                return self.created(new_id)
+            if path == "/relationships":
+                items[body["fromItem"]], items[body["toItem"]]
+                for rel in list(self.by_from[body["fromItem"]].values()):
+                    if (rel["fromItem"], rel["toItem"], rel["relationshipType"]) == (body["fromItem"], body["toItem"], body.get("relationshipType")):
+                        return 400, {"meta": {"status": "Bad Request", "message": "Relationship already exists"}}
+                return self.created(self._add_relationship(body["fromItem"], body["toItem"], body.get("relationshipType"))["id"])
+            if parts[0] == "testplans" and parts[-1] == "testcases":
+                self.testgroups[ids[1]]["testCases"].append(body["testCase"])
+                return self.created(self._new_id())
+            if parts[0] == "testplans" and parts[-1] == "testgroups":
+                new_id = self._new_id()
+                self.testgroups[new_id] = {"id": new_id, "name": body["name"], "testPlan": ids[0], "testCases": []}
+                return self.created(new_id)
+            if parts[0] == "testplans" and parts[-1] == "testcycles":
+                new_id = self._new_id()
+                self.testcycles[new_id] = {"id": new_id, "fields": dict(body["fields"], testPlan=ids[0])}
+                return self.created(new_id)
+            if path == "/testplans":
+                new_id = self._new_id()
+                self.testplans[new_id] = {"id": new_id, "project": body["project"], "fields": body["fields"]}
+                return self.created(new_id)
+            if parts[0] == "items" and parts[-1] == "links":
+                return self.created(self._new_id())
+        if method == "DELETE":
+            if parts[0] == "relationships":
+                self._remove_relationship(ids[0])
+                return 204, None
+            if parts[0] == "testruns":
+                with self.lock:
+                    del self.testruns[ids[0]]
+                return 204, None
+        raise KeyError(path)
@@ -0,0 +1,370 @@
+"""
+Local proxy daemon holding one warm jama client, for many short-lived scripts on a host to share
+Scripts then skip the import, lookup table and connection warm-up, hit one shared response cache, and are rate
+limited together. The daemon serves the client's public methods as JSON over HTTP on localhost; JamaProxy is a
+thin client with the same method names.
+
+Usage:
+    python jamaproxy.py --base-url https://jama.example.com/rest/latest --username autocreator --project PROJ
+and in each script:
+    jam = JamaProxy()
+    jam.find_req_id("PROJ-REQ-123")
+
+Only methods that read from JAMA are served, unless the daemon is started with --allow-writes.
+Callers must send the daemon's token, which it generates at start up (unless given one) and writes to a file
+only the daemon's user can read (default ~/.jamaproxy_token), where JamaProxy reads it from.
+Requests must be JSON, and requests from web pages (with an Origin header) are refused.
+
+Results come back as they would from jama, except that generators come back as lists, tuples as lists,
+and Responses (from ask, put and post) as ProxyResponse. Callback arguments such as progress can't be passed.
+The client, and so its set project, is shared by every script using the daemon.
+
+The MIT licence:
+Copyright (c) 2016-2019 Optos plc
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated documentation files (the "Software"), to deal in the Software without restriction, including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+import json
+import os
+import secrets
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+DEFAULT_URL = "http://127.0.0.1:8765"
+DEFAULT_TOKEN_FILE = os.path.join(os.path.expanduser("~"), ".jamaproxy_token")
+TOKEN_HEADER = "X-Jama-Proxy-Token"
+# Client attributes that can be read through the proxy
+ATTRIBUTES = ("base_url", "project_id", "lookup", "users", "page_workers", "batch_workers")
+# Client methods that are not served
+PRIVATE_METHODS = ("close", "concurrent")
+# Client methods that only read, served without allow_writes
+READ_PREFIXES = ("ask", "find_", "get_", "iter_", "search")
+READ_METHODS = ("testrun_islocked",)
+
+
+def encode(value):
+    """
+    Make a result JSON serialisable, tagging what JSON can't otherwise carry
+    :param value: <any> : Result from a jama method
+    :return: <any>
+    """
+    if isinstance(value, requests.Response):
+        return {
+            "__response__": {
+                "status_code": value.status_code,
+                "url": value.url,
+                "headers": dict(value.headers),
+                "text": value.text,
+            }
+        }
+    if isinstance(value, dict):
+        if all(type(k) is str for k in value):
+            return {k: encode(v) for k, v in value.items()}
+        return {"__pairs__": [[encode(k), encode(v)] for k, v in value.items()]}  # e.g. keyed by JAMA ID
+    if isinstance(value, tuple) and hasattr(value, "_fields"):
+        return {"__record__": [encode(x) for x in value]}
+    if isinstance(value, (list, tuple, set)) or hasattr(value, "__next__"):
+        return [encode(x) for x in value]
+    return value
+
+
+def _key(value):
+    return tuple(_key(x) for x in value) if type(value) is list else value
+
+
+class ProxyResponse:
+    """
+    The parts of a requests Response that scripts use, as returned through the proxy
+    """
+
+    def __init__(self, status_code, url, headers, text):
+        self.status_code = status_code
+        self.url = url
+        self.headers = requests.structures.CaseInsensitiveDict(headers)
+        self.text = text
+        self.content = text.encode()
+        self.ok = status_code < 400
+
+    def json(self):
+        return json.loads(self.text)
+
+
+def write_token(token, path):
+    """
+    Save a token to a file only this user can read
+    :param token: <str>
+    :param path: <str> : File to write
+    """
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "w") as f:
+        os.chmod(path, 0o600)  # In case it already existed
+        f.write(token)
+
+
+def read_token(path=DEFAULT_TOKEN_FILE):
+    """
+    :param path: <str> : File written by the daemon
+    :return: <str> : Token, None if there is no file
+    """
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except FileNotFoundError:
+        return None
+
+
+class JamaProxyServer:
+    def __init__(self, jama, host="127.0.0.1", port=8765, token=None, token_file=DEFAULT_TOKEN_FILE, allow_writes=False):
+        """
+        :param jama: <jama> : Client to share
+        :param host: <str> : Address to listen on
+        :param port: <int> : Port to listen on, 0 for any free port
+        :param token: <str> : Secret that callers must send (default a new random one)
+        :param token_file: <str> : File to write the token to, readable only by this user, for JamaProxy to read
+            (None to not write it)
+        :param allow_writes: <bool> : Also serve methods that change JAMA, or the shared client's state
+        """
+        self.jama = jama
+        self.token = token or secrets.token_urlsafe(32)
+        if token_file:
+            write_token(self.token, token_file)
+        self.methods = sorted(
+            name
+            for name in dir(type(jama))
+            if not name.startswith("_")
+            and name not in PRIVATE_METHODS
+            and callable(getattr(type(jama), name))
+            and (allow_writes or name.startswith(READ_PREFIXES) or name in READ_METHODS)
+        )
+        self.calls = 0
+        self.lock = threading.Lock()
+        self.server = ThreadingHTTPServer((host, port), self._handler())
+        self.server.daemon_threads = True
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def serve_forever(self):
+        self.server.serve_forever()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def call(self, name, args, kwargs):
+        """
+        :param name: <str> : Method or attribute of the client
+        :param args: <list> : Positional arguments for a method
+        :param kwargs: <dict> : Keyword arguments for a method
+        :return: <any> : Result, encoded for JSON
+        """
+        with self.lock:
+            self.calls += 1
+        if name in ATTRIBUTES:
+            return encode(getattr(self.jama, name))
+        if name not in self.methods:
+            raise Exception(f"No jama method {name}")
+        return encode(getattr(self.jama, name)(*args, **kwargs))
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args):
+                pass
+
+            def _reply(self, code, body, content_type="application/json"):
+                data = body.encode() if type(body) is str else json.dumps(body).encode()
+                self.send_response(code)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _allowed(self):
+                if "Origin" in self.headers:  # Sent by browsers, so a web page is trying to use the daemon
+                    self._reply(403, {"error": "Cross-origin requests not allowed"})
+                    return False
+                if not secrets.compare_digest(self.headers.get(TOKEN_HEADER, ""), server.token):
+                    self._reply(403, {"error": "Bad or missing proxy token"})
+                    return False
+                return True
+
+            def do_GET(self):
+                if not self._allowed():
+                    return
+                if self.path == "/describe":
+                    self._reply(200, {"methods": server.methods, "attributes": ATTRIBUTES, "calls": server.calls})
+                elif self.path == "/metrics":
+                    self._reply(200, server.jama.metrics.openmetrics(), "application/openmetrics-text")
+                else:
+                    self._reply(404, {"error": f"{self.path} not found"})
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                data = self.rfile.read(length)
+                if not self._allowed():
+                    return
+                if self.headers.get("Content-Type", "").split(";")[0].strip() != "application/json":
+                    return self._reply(415, {"error": "Content-Type must be application/json"})
+                if self.path != "/call":
+                    return self._reply(404, {"error": f"{self.path} not found"})
+                try:
+                    body = json.loads(data)
+                except ValueError:
+                    return self._reply(400, {"error": "Body is not JSON"})
+                try:
+                    result = server.call(body["method"], body.get("args", []), body.get("kwargs", {}))
+                except Exception as e:
+                    return self._reply(500, {"error": str(e), "type": type(e).__name__})
+                self._reply(200, {"result": result})
+
+        return Handler
+
+
+class JamaProxy:
+    """
+    Stand-in for a jama client that makes its calls through a JamaProxyServer
+    """
+
+    def __init__(self, url=DEFAULT_URL, token=None, token_file=DEFAULT_TOKEN_FILE, timeout=None):
+        """
+        :param url: <str> : Proxy daemon's address
+        :param token: <str> : Secret the daemon was started with (default read from token_file)
+        :param token_file: <str> : File the daemon wrote its token to
+        :param timeout: <float> : Seconds to wait for each call (default no limit, as ask_big can take a while)
+        """
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+        self.session = requests.Session()
+        token = token or read_token(token_file)
+        if token:
+            self.session.headers[TOKEN_HEADER] = token
+        self.methods = None
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def describe(self):
+        """
+        :return: <dict> : Methods and attributes the daemon serves, and how many calls it has handled
+        """
+        resp = self.session.get(self.url + "/describe", timeout=self.timeout)
+        if resp.status_code != 200:
+            raise Exception(f"JAMA proxy Non-success code {resp.status_code}: {resp.text}")
+        return resp.json()
+
+    def call(self, name, *args, **kwargs):
+        """
+        Call a jama method (or read an attribute) in the daemon
+        :param name: <str> : Method or attribute name
+        :return: <any> : Result
+        """
+        fields = kwargs.get("fields")
+        record = None
+        if fields:
+            from jamarest import record_type
+
+            record = record_type(tuple(fields))._make
+
+        def decode(obj):
+            if "__response__" in obj:
+                return ProxyResponse(**obj["__response__"])
+            if "__pairs__" in obj:
+                return {_key(k): v for k, v in obj["__pairs__"]}
+            if "__record__" in obj:
+                return record(obj["__record__"]) if record else obj["__record__"]
+            return obj
+
+        resp = self.session.post(
+            self.url + "/call", json={"method": name, "args": args, "kwargs": kwargs}, timeout=self.timeout
+        )
+        reply = json.loads(resp.text, object_hook=decode)
+        if resp.status_code != 200:
+            raise Exception(reply.get("error", f"JAMA proxy Non-success code {resp.status_code}"))
+        return reply["result"]
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        if self.methods is None:
+            self.methods = set(self.describe()["methods"])
+        if name in self.methods:
+            return lambda *args, **kwargs: self.call(name, *args, **kwargs)
+        if name in ATTRIBUTES:
+            return self.call(name)
+        raise AttributeError(name)
+
+
+if __name__ == '__main__':
+    import argparse
+
+    from jamarest import jama, ResponseCache
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", required=True, help="JAMA REST API base URL")
+    parser.add_argument("--username", required=True, help="JAMA user, whose password is in the keyring under 'jama'")
+    parser.add_argument("--project", help="JAMA project key to set")
+    parser.add_argument("--host", default="127.0.0.1", help="Address to listen on")
+    parser.add_argument("--port", type=int, default=8765, help="Port to listen on")
+    parser.add_argument("--token", help="Secret that callers must send (default a new random one)")
+    parser.add_argument("--token-file", default=DEFAULT_TOKEN_FILE, help="File to write the token to for callers")
+    parser.add_argument("--allow-writes", action="store_true", help="Also serve methods that change JAMA")
+    parser.add_argument("--rate", type=float, default=12, help="Requests per second to JAMA")
+    parser.add_argument("--cache-ttl", type=float, default=60, help="Seconds to serve cached GETs for")
+    parser.add_argument("--lookup-cache", help="File to keep lookup tables in between runs")
+    args = parser.parse_args()
+
+    import keyring
+    password = keyring.get_password("jama", args.username)
+    if not password:
+        raise Exception(
+            f"Could not retrieve password for JAMA, try: keyring.set_password('jama','{args.username}','yourpassword')"
+        )
+    jam = jama(
+        args.base_url,
+        args.username,
+        password,
+        rate_limit=args.rate,
+        cache=ResponseCache(ttl=args.cache_ttl),
+        lookup_cache=args.lookup_cache,
+    )
+    if args.project:
+        jam.set_project(args.project)
+    jam.lookup  # Warm up before taking calls
+    proxy = JamaProxyServer(jam, args.host, args.port, args.token, args.token_file, args.allow_writes)
+    print(f"Serving {args.base_url} as {args.username} on {proxy.url}")
+    try:
+        proxy.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        proxy.server.server_close()
+        jam.close()
@@ -16,132 +16,1237 @@ http://meta.stackexchange.com/questions/271080/the-mit-license-clarity-on-using-
 import urllib.parse
 import urllib.error
 import requests
+import requests.adapters
 import time
 import re
+import threading
+import email.utils
+import collections
+import random
+import itertools
+import json
+import os
+import functools
+import keyword
 
-# Try one version of BeautifulSoup, then another
 try:
-    from bs4 import BeautifulSoup
-except ModuleNotFoundError:
-    from BeautifulSoup import BeautifulSoup
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
 
-# Rate limiting decorator
-# code from http://stackoverflow.com/questions/667508/whats-a-good-rate-limiting-algorithm/667706#667706
-def rate_limited(max_per_second):
-    min_interval = 1.0 / float(max_per_second)
+try:
+    import orjson  # Optional, decodes large pages several times faster than json
+except ImportError:
+    orjson = None
+
+class TokenBucket:
+    """
+    Thread-safe token bucket rate limiter, shared by all reads and writes of a jama client.
+    Allows bursts of up to burst requests, then refills at rate requests per second.
+    On a throttled (429) response the rate is halved once (down to min_rate) and requests are held back
+    until any Retry-After has passed; each successful response then recovers the rate towards its maximum.
+    """
+
+    def __init__(self, rate=12, burst=None, min_rate=0.5, recovery=0.05):
+        """
+        :param rate: <float> : Maximum sustained requests per second
+        :param burst: <int> : Maximum requests allowed back to back (default same as rate)
+        :param min_rate: <float> : Lowest rate to back off to when throttled
+        :param recovery: <float> : Fraction of the maximum rate added back for each successful response
+        """
+        self.max_rate = float(rate)
+        self.rate = float(rate)
+        self.burst = float(burst or max(1, rate))
+        self.min_rate = min_rate
+        self.recovery = recovery
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, tokens=1):
+        """
+        Block until a request may be made
+        :param tokens: <int> : Number of requests to take from the bucket
+        :return: <float> : Seconds spent waiting
+        """
+        waited = 0.0
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now >= self.blocked_until and self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return waited
+                wait = max(
+                    self.blocked_until - now, (tokens - self.tokens) / self.rate
+                )
+            time.sleep(wait)
+            waited += wait
+
+    def throttled(self, retry_after=None):
+        """
+        Server told us to slow down: back off the rate and hold all requests for retry_after seconds
+        :param retry_after: <float> : Seconds to wait before the next request
+        """
+        with self.lock:
+            now = time.monotonic()
+            self._refill(now)
+            if now >= self.blocked_until:  # Requests already in flight when we backed off don't count again
+                self.rate = max(self.min_rate, self.rate / 2)
+            self.tokens = 0.0
+            if retry_after:
+                self.blocked_until = max(self.blocked_until, now + retry_after)
+
+    def success(self):
+        """
+        Request went through: recover the rate towards its maximum
+        """
+        if self.rate < self.max_rate:
+            with self.lock:
+                self.rate = min(self.max_rate, self.rate + self.recovery * self.max_rate)
+
+
+class SharedTokenBucket(TokenBucket):
+    """
+    Token bucket shared by every jama client on a host that uses the same state file, so that together
+    cron jobs and scripts stay within the server's rate limit. The bucket is held in the file, under a file lock.
+    Waiting requests are served strictly by priority class, then first come first served within a class,
+    so interactive tools get ahead of bulk syncs. All users of a file should be given the same rate and burst.
+    """
+
+    PRIORITIES = {"interactive": 0, "normal": 1, "bulk": 2}
+
+    def __init__(self, path, rate=12, burst=None, min_rate=0.5, recovery=0.05, priority="normal", poll=0.05, stale=10.0):
+        """
+        :param path: <str> : State file shared by all the clients, created if missing
+        :param rate: <float> : Maximum sustained requests per second, for all the clients together
+        :param burst: <int> : Maximum requests allowed back to back (default same as rate)
+        :param min_rate: <float> : Lowest rate to back off to when throttled
+        :param recovery: <float> : Fraction of the maximum rate added back for each successful response
+        :param priority: <str/int> : "interactive", "normal" or "bulk" (or a number, lower served first)
+        :param poll: <float> : Longest time to sleep between checks while waiting behind other requests
+        :param stale: <float> : Seconds after which a waiting request that has stopped checking is dropped from the queue
+        """
+        super().__init__(rate, burst, min_rate, recovery)
+        self.path = path
+        self.priority = self.PRIORITIES.get(priority, priority)
+        self.poll = poll
+        self.stale = stale
+        self.tickets = itertools.count()
+
+    def _locked(self, update):
+        """
+        Call update with the shared state, under the file lock, and save the state it leaves
+        :param update: <function> : Called with state dict and the time, returns a value
+        :return: <any> : update's return value
+        """
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o666)
+        with os.fdopen(fd, "r+b") as f:
+            if fcntl:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            else:
+                while True:
+                    try:
+                        msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                        break
+                    except OSError:  # LK_LOCK gives up after 10 seconds
+                        pass
+            try:
+                now = time.time()  # Not monotonic, as it must agree between processes
+                try:
+                    state = json.loads(f.read())
+                except ValueError:  # New file
+                    state = {"tokens": self.burst, "updated": now, "rate": self.max_rate, "blocked_until": 0.0, "queue": []}
+                state["tokens"] = min(self.burst, state["tokens"] + max(0.0, now - state["updated"]) * state["rate"])
+                state["updated"] = now
+                result = update(state, now)
+                self.rate = state["rate"]
+                f.seek(0)
+                f.write(json.dumps(state).encode())
+                f.truncate()
+                f.flush()
+                return result
+            finally:
+                if fcntl:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+                else:
+                    f.seek(0)
+                    msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+    def acquire(self, tokens=1):
+        """
+        Block until a request may be made, waiting behind earlier and higher priority requests from any client
+        :param tokens: <int> : Number of requests to take from the bucket
+        :return: <float> : Seconds spent waiting
+        """
+        ticket = f"{os.getpid()}.{threading.get_ident()}.{next(self.tickets)}"
+
+        def take(state, now):
+            # Queue entries are [priority, time queued, ticket, time last checked]
+            queue = [x for x in state["queue"] if x[2] == ticket or now - x[3] < self.stale]
+            mine = next((x for x in queue if x[2] == ticket), None)
+            if mine is None:
+                mine = [self.priority, now, ticket, now]
+                queue.append(mine)
+            mine[3] = now
+            queue.sort(key=lambda x: (x[0], x[1]))
+            state["queue"] = queue
+            if queue[0] is not mine:
+                return self.poll
+            if now >= state["blocked_until"] and state["tokens"] >= tokens:
+                state["tokens"] -= tokens
+                queue.pop(0)
+                return 0.0
+            # Check back at least every poll seconds, so as not to be taken for stale
+            return min(self.poll, max(state["blocked_until"] - now, (tokens - state["tokens"]) / state["rate"]))
+
+        waited = 0.0
+        while True:
+            wait = self._locked(take)
+            if not wait:
+                return waited
+            time.sleep(wait)
+            waited += wait
+
+    def throttled(self, retry_after=None):
+        """
+        Server told us to slow down: back off the shared rate and hold all clients' requests for retry_after seconds
+        :param retry_after: <float> : Seconds to wait before the next request
+        """
+
+        def back_off(state, now):
+            if now >= state["blocked_until"]:  # Requests already in flight when we backed off don't count again
+                state["rate"] = max(self.min_rate, state["rate"] / 2)
+            state["tokens"] = 0.0
+            if retry_after:
+                state["blocked_until"] = max(state["blocked_until"], now + retry_after)
+
+        self._locked(back_off)
+
+    def success(self):
+        """
+        Request went through: recover the shared rate towards its maximum
+        """
+        if self.rate < self.max_rate:
+
+            def recover(state, now):
+                state["rate"] = min(self.max_rate, state["rate"] + self.recovery * self.max_rate)
+
+            self._locked(recover)
+
+
+def retry_after_seconds(response):
+    """
+    Get the Retry-After delay from a response, given either as seconds or an HTTP date
+    :param response: <requests response>
+    :return: <float> : Seconds to wait, or None if not given
+    """
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, when.timestamp() - time.time())
+
+
+class RetryPolicy:
+    """
+    When and how long to wait before retrying a failed request, shared by all the workers of a jama client.
+    Retries use exponential backoff with random jitter, or the server's Retry-After if longer.
+    After breaker_threshold overloads in a row, from any worker, the circuit breaker opens and every
+    request waits breaker_pause seconds before being sent, so the server gets a chance to recover.
+    An overload counts once however many requests in flight fail with it: failures while a back-off is
+    already in force are part of the same overload.
+    """
+
+    def __init__(
+        self,
+        max_attempts=5,
+        backoff=1.0,
+        max_backoff=60.0,
+        jitter=0.5,
+        retry_statuses=(429, 502, 503, 504),
+        breaker_threshold=5,
+        breaker_pause=30.0,
+    ):
+        """
+        :param max_attempts: <int> : Most times to send a request, including the first
+        :param backoff: <float> : Seconds to wait before the first retry, doubling for each one after
+        :param max_backoff: <float> : Longest wait between attempts
+        :param jitter: <float> : Fraction of the wait to randomly add or take away, so workers don't retry together
+        :param retry_statuses: <tuple of ints> : Status codes to retry (429 is also retried for non-idempotent writes)
+        :param breaker_threshold: <int> : Overloads in a row that open the circuit breaker
+        :param breaker_pause: <float> : Seconds the circuit breaker holds all requests for
+        """
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.jitter = jitter
+        self.retry_statuses = retry_statuses
+        self.breaker_threshold = breaker_threshold
+        self.breaker_pause = breaker_pause
+        self.overloads = 0
+        self.open_until = 0.0
+        self.backing_off_until = 0.0
+        self.lock = threading.Lock()
+
+    def should_retry(self, attempt, status=None, idempotent=True):
+        """
+        :param attempt: <int> : Attempts made so far
+        :param status: <int> : Status code received, None for a connection error
+        :param idempotent: <bool> : Request can safely be sent again even if the server may have acted on it
+        :return: <bool>
+        """
+        if attempt >= self.max_attempts:
+            return False
+        if status is None:
+            return idempotent
+        return status in self.retry_statuses and (idempotent or status == 429)
+
+    def delay(self, attempt, retry_after=None):
+        """
+        :param attempt: <int> : Attempts made so far
+        :param retry_after: <float> : Seconds the server asked us to wait
+        :return: <float> : Seconds to wait before the next attempt
+        """
+        wait = min(self.max_backoff, self.backoff * 2 ** (attempt - 1))
+        wait *= 1 + self.jitter * (2 * random.random() - 1)
+        return max(wait, retry_after or 0)
+
+    def failed(self, status=None, delay=0.0):
+        """
+        Count an overload response (or connection error) towards opening the circuit breaker
+        :param status: <int> : Status code received, None for a connection error
+        :param delay: <float> : Seconds the request will back off for
+        """
+        with self.lock:
+            now = time.monotonic()
+            if now < self.backing_off_until:  # Requests already in flight when we backed off don't count again
+                return
+            self.backing_off_until = now + delay
+            self.overloads += 1
+            if self.overloads >= self.breaker_threshold:
+                self.open_until = max(self.open_until, now + self.breaker_pause)
+                self.overloads = 0
+
+    def succeeded(self):
+        with self.lock:
+            self.overloads = 0
+
+    def wait(self):
+        """
+        Block while the circuit breaker is open
+        :return: <float> : Seconds waited
+        """
+        pause = self.open_until - time.monotonic()
+        if pause > 0:
+            time.sleep(pause)
+            return pause
+        return 0.0
+
+
+class JamaPagingError(Exception):
+    """
+    A page of a paged query failed after retries. The query can be resumed from start_at,
+    and for ask_big, results holds what was retrieved before it.
+    """
+
+    def __init__(self, message, resource, start_at, results=None):
+        super().__init__(message)
+        self.resource = resource
+        self.start_at = start_at
+        self.results = results
+
+
+class ResponseCache:
+    """
+    Thread-safe LRU cache of GET responses for a jama client, keyed by the resource with its query arguments sorted.
+    Entries expire after a TTL chosen by the longest matching resource prefix in ttls (else the default ttl).
+    Expired entries that carry an ETag or Last-Modified header are revalidated with a conditional request
+    rather than fetched again. Writes to a resource drop the cached entries under it.
+    """
+
+    def __init__(self, max_entries=1024, max_bytes=None, ttl=60, ttls=None):
+        """
+        :param max_entries: <int> : Most responses to hold
+        :param max_bytes: <int> : Most response body bytes to hold (default no limit)
+        :param ttl: <float> : Seconds a response stays fresh, for resources not in ttls
+        :param ttls: <dict> : Resource prefix:seconds, e.g. {"/picklists": 3600}. 0 means never cache.
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.ttls = sorted((ttls or {}).items(), key=lambda x: -len(x[0]))
+        self.entries = collections.OrderedDict()  # key: (response, expires, size)
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.revalidated = 0
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def key(resource):
+        """
+        Normalise a resource so the same query in a different argument order shares an entry
+        :param resource: <str>
+        :return: <str>
+        """
+        path, _, query = resource.partition("?")
+        if not query:
+            return path
+        return path + "?" + urllib.parse.urlencode(sorted(urllib.parse.parse_qsl(query, keep_blank_values=True)))
+
+    def ttl_for(self, resource):
+        return next((ttl for prefix, ttl in self.ttls if resource.startswith(prefix)), self.ttl)
+
+    def get(self, resource):
+        """
+        Look up a cached response
+        :param resource: <str>
+        :return: <tuple> : (response or None, True if it is still fresh)
+        """
+        key = self.key(resource)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None, False
+            response, expires, size = entry
+            if time.monotonic() < expires:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return response, True
+            if "ETag" in response.headers or "Last-Modified" in response.headers:
+                return response, False
+            self._drop(key)
+            self.misses += 1
+            return None, False
+
+    @staticmethod
+    def conditional_headers(response):
+        """
+        Headers to ask the server whether a cached response has changed
+        :param response: <requests response> : Stale cached response
+        :return: <dict>
+        """
+        headers = {}
+        if "ETag" in response.headers:
+            headers["If-None-Match"] = response.headers["ETag"]
+        if "Last-Modified" in response.headers:
+            headers["If-Modified-Since"] = response.headers["Last-Modified"]
+        return headers
+
+    def put(self, resource, response):
+        """
+        Store (or refresh after revalidation) a successful response
+        :param resource: <str>
+        :param response: <requests response>
+        """
+        ttl = self.ttl_for(resource)
+        if not ttl:
+            return
+        key = self.key(resource)
+        size = len(response.content)
+        with self.lock:
+            if key in self.entries:
+                if self.entries[key][0] is response:
+                    self.revalidated += 1
+                self._drop(key)
+            self.entries[key] = (response, time.monotonic() + ttl, size)
+            self.bytes += size
+            while self.entries and (
+                len(self.entries) > self.max_entries
+                or (self.max_bytes and self.bytes > self.max_bytes)
+            ):
+                self._drop(next(iter(self.entries)))
+
+    def _drop(self, key):
+        self.bytes -= self.entries.pop(key)[2]
+
+    def invalidate(self, resource, json=None):
+        """
+        Drop cached responses for a resource that has been written to, anything under it, and listings of the
+        collection it is in (e.g. /relationships?project=1 for a write to /relationships/5).
+        Item resources are also known as abstractitems, and relationships change both ends' items.
+        :param resource: <str> : Resource written to
+        :param json: <dict> : Body of the write, or fromItem and toItem of a relationship deleted
+        """
+        path = resource.partition("?")[0].rstrip("/")
+        paths = {path, re.sub("^/items/", "/abstractitems/", path), re.sub("^/abstractitems/", "/items/", path)}
+        if isinstance(json, dict):
+            for end in ("fromItem", "toItem"):
+                if end in json:
+                    paths.update({f"/items/{json[end]}", f"/abstractitems/{json[end]}"})
+        listings = {p.rpartition("/")[0] for p in paths} - {""}  # Only their listings, not their other members
+        with self.lock:
+            for key in list(self.entries):
+                key_path = key.partition("?")[0]
+                if key_path in listings or any(key_path == p or key_path.startswith(p + "/") for p in paths):
+                    self._drop(key)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.bytes = 0
+
+
+class SingleFlight:
+    """
+    Thread-safe coalescing of identical concurrent calls: while a call for a key is in flight,
+    further calls for the same key wait for it and share its result (or exception) instead of repeating it.
+    """
+
+    def __init__(self):
+        self.calls = {}  # Key: dict of done Event, then result or error, for each call in flight
+        self.lock = threading.Lock()
+        self.made = 0
+        self.coalesced = 0
+
+    def do(self, key, func, on_shared=None):
+        """
+        :param key: <hashable> : Identifies the call, e.g. the resource requested
+        :param func: <function> : Makes the call, with no arguments
+        :param on_shared: <function> : Called with no arguments if this call is coalesced into one in flight
+        :return: <any> : func's result
+        """
+        with self.lock:
+            call = self.calls.get(key)
+            if call is None:
+                call = self.calls[key] = {"done": threading.Event()}
+                self.made += 1
+                leader = True
+            else:
+                self.coalesced += 1
+                leader = False
+        if not leader:
+            if on_shared:
+                on_shared()
+            call["done"].wait()
+            if "error" in call:
+                raise call["error"]
+            return call["result"]
+        try:
+            call["result"] = func()
+            return call["result"]
+        except Exception as e:
+            call["error"] = e
+            raise
+        finally:
+            with self.lock:
+                if self.calls.get(key) is call:  # Not already forgotten
+                    del self.calls[key]
+            call["done"].set()
+
+    def forget(self):
+        """
+        Stop later calls joining any call now in flight, e.g. after a write that those calls may not reflect.
+        Calls already waiting still get the result they were waiting for.
+        """
+        with self.lock:
+            self.calls.clear()
+
+
+class RequestMetrics:
+    """
+    Thread-safe per-endpoint statistics of a jama client's requests. Endpoints are grouped by method and path template,
+    with numeric path parts replaced by {id}, e.g. "GET /items/{id}/downstreamrelationships".
+    For each it counts requests, response bytes, status codes, throttled (429) responses, retries, pages per ask_big,
+    requests coalesced into one already in flight, a histogram of latencies and time spent waiting for the rate limiter.
+    Hooks are called with a dict describing each request as it completes.
+    """
+
+    buckets = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, float("inf"))  # Latency histogram upper bounds, seconds
+
+    def __init__(self, hooks=None):
+        """
+        :param hooks: <list of functions> : Called with a dict of method, url, endpoint, status, seconds, bytes and waited for each request
+        """
+        self.hooks = list(hooks or [])
+        self.endpoints = {}
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def endpoint(method, url):
+        """
+        The template an URL is counted under
+        :param method: <str> : HTTP method
+        :param url: <str> : Full URL or resource
+        :return: <str>
+        """
+        path = urllib.parse.urlsplit(url).path
+        path = re.sub("^.*/rest/[^/]+", "", path)  # Relative to the API base
+        return method + " " + re.sub("/[0-9]+(?=/|$)", "/{id}", path)
+
+    def _stats(self, endpoint):
+        stats = self.endpoints.get(endpoint)
+        if stats is None:
+            stats = self.endpoints[endpoint] = {
+                "requests": 0,
+                "seconds": 0.0,
+                "bytes": 0,
+                "statuses": collections.Counter(),
+                "throttled": 0,
+                "retries": 0,
+                "coalesced": 0,
+                "waited": 0.0,
+                "ask_big": 0,
+                "pages": 0,
+                "histogram": [0] * len(self.buckets),
+            }
+        return stats
+
+    def record(self, method, url, status, seconds, size, waited=0.0):
+        """
+        Count a completed request
+        :param method: <str> : HTTP method
+        :param url: <str> : URL requested
+        :param status: <int> : Response status code
+        :param seconds: <float> : Time from sending to response
+        :param size: <int> : Response body bytes
+        :param waited: <float> : Time spent waiting for the rate limiter first
+        """
+        endpoint = self.endpoint(method, url)
+        with self.lock:
+            stats = self._stats(endpoint)
+            stats["requests"] += 1
+            stats["seconds"] += seconds
+            stats["bytes"] += size
+            stats["statuses"][status] += 1
+            stats["waited"] += waited
+            if status == 429:
+                stats["throttled"] += 1
+            stats["histogram"][next(i for i, b in enumerate(self.buckets) if seconds <= b)] += 1
+        for hook in self.hooks:
+            hook(
+                {
+                    "method": method,
+                    "url": url,
+                    "endpoint": endpoint,
+                    "status": status,
+                    "seconds": seconds,
+                    "bytes": size,
+                    "waited": waited,
+                }
+            )
+
+    def retry(self, method, url):
+        with self.lock:
+            self._stats(self.endpoint(method, url))["retries"] += 1
+
+    def coalesced(self, method, url):
+        """
+        Count a request answered by sharing the response of an identical one already in flight
+        """
+        with self.lock:
+            self._stats(self.endpoint(method, url))["coalesced"] += 1
+
+    def waited(self, method, url, seconds):
+        """
+        Count time a request spent held back other than by the rate limiter, e.g. backing off before a retry
+        """
+        if seconds:
+            with self.lock:
+                self._stats(self.endpoint(method, url))["waited"] += seconds
+
+    def pages(self, url, count):
+        """
+        Count the pages fetched for one ask_big or iter_big
+        :param url: <str> : Resource paged through
+        :param count: <int> : Number of pages
+        """
+        with self.lock:
+            stats = self._stats(self.endpoint("GET", url))
+            stats["ask_big"] += 1
+            stats["pages"] += count
+
+    def snapshot(self):
+        """
+        :return: <dict> : Copy of the statistics for each endpoint
+        """
+        with self.lock:
+            return {
+                endpoint: dict(stats, statuses=dict(stats["statuses"]), histogram=list(stats["histogram"]))
+                for endpoint, stats in self.endpoints.items()
+            }
+
+    def reset(self):
+        with self.lock:
+            self.endpoints.clear()
+
+    def openmetrics(self, prefix="jamarest"):
+        """
+        The statistics in Prometheus/OpenMetrics text exposition format
+        :param prefix: <str> : Metric name prefix
+        :return: <str>
+        """
+        lines = [
+            f"# TYPE {prefix}_request_seconds histogram",
+            f"# TYPE {prefix}_response_bytes counter",
+            f"# TYPE {prefix}_throttled counter",
+            f"# TYPE {prefix}_retries counter",
+            f"# TYPE {prefix}_coalesced counter",
+            f"# TYPE {prefix}_ratelimit_wait_seconds counter",
+            f"# TYPE {prefix}_pages counter",
+        ]
+        for endpoint, stats in sorted(self.snapshot().items()):
+            method, path = endpoint.split(" ", 1)
+            labels = f'method="{method}",endpoint="{path}"'
+            total = 0
+            for bound, count in zip(self.buckets, stats["histogram"]):
+                total += count
+                le = "+Inf" if bound == float("inf") else bound
+                lines.append(f'{prefix}_request_seconds_bucket{{{labels},le="{le}"}} {total}')
+            lines.append(f"{prefix}_request_seconds_sum{{{labels}}} {stats['seconds']}")
+            lines.append(f"{prefix}_request_seconds_count{{{labels}}} {stats['requests']}")
+            lines.append(f"{prefix}_response_bytes_total{{{labels}}} {stats['bytes']}")
+            lines.append(f"{prefix}_throttled_total{{{labels}}} {stats['throttled']}")
+            lines.append(f"{prefix}_retries_total{{{labels}}} {stats['retries']}")
+            lines.append(f"{prefix}_coalesced_total{{{labels}}} {stats['coalesced']}")
+            lines.append(f"{prefix}_ratelimit_wait_seconds_total{{{labels}}} {stats['waited']}")
+            lines.append(f"{prefix}_pages_total{{{labels}}} {stats['pages']}")
+        lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+    def report(self):
+        """
+        Summary table of where the time went, busiest endpoints first
+        :return: <str>
+        """
+        rows = [f"{'endpoint':60} {'reqs':>6} {'secs':>8} {'avg ms':>7} {'waited':>7} {'KB':>8} {'429':>4} {'retry':>5} {'dedup':>5} {'pages':>6}"]
+        for endpoint, stats in sorted(self.snapshot().items(), key=lambda x: -x[1]["seconds"]):
+            avg = 1000 * stats["seconds"] / stats["requests"] if stats["requests"] else 0
+            rows.append(
+                f"{endpoint[:60]:60} {stats['requests']:>6} {stats['seconds']:>8.2f} {avg:>7.0f} {stats['waited']:>7.2f}"
+                f" {stats['bytes'] / 1024:>8.0f} {stats['throttled']:>4} {stats['retries']:>5} {stats['coalesced']:>5} {stats['pages']:>6}"
+            )
+        return "\n".join(rows)
+
+
+def print_request(event):
+    """
+    RequestMetrics hook printing each request, as used for debug
+    """
+    print(f"{event['method']} {event['url']} {event['status']} {event['seconds'] * 1000:.0f}ms")
+
+
+@functools.lru_cache(maxsize=None)
+def html_parser():
+    """
+    :return: <str> : Fastest parser BeautifulSoup can use here: lxml if installed, else the built in html.parser
+    """
+    import importlib.util
+
+    return "lxml" if importlib.util.find_spec("lxml") else "html.parser"
 
-    def decorate(func):
-        last_time_called = [0.0]
 
-        def rate_limited_function(*args, **kargs):
-            elapsed = time.time() - last_time_called[0]
-            left_to_wait = min_interval - elapsed
-            if left_to_wait > 0:
-                time.sleep(left_to_wait)
-            ret = func(*args, **kargs)
-            last_time_called[0] = time.time()
-            return ret
+def html_to_lines(contents_string):
+    """
+    Render rich text from a JAMA field as plain text lines
+    :param contents_string: <str> : HTML of the field
+    :return: <list> : rendered text lines
+    """
+    # Try one version of BeautifulSoup, then another. Imported here as it is slow to load and rarely needed.
+    try:
+        from bs4 import BeautifulSoup
 
-        return rate_limited_function
+        bs = BeautifulSoup(contents_string, html_parser())  # Converts entities itself
+    except ModuleNotFoundError:
+        from BeautifulSoup import BeautifulSoup
 
-    return decorate
+        bs = BeautifulSoup(
+            contents_string, convertEntities=BeautifulSoup.HTML_ENTITIES
+        )
+    txt = bs.getText("\n")
+    return [re.sub("[\r\n]*$", "", x) for x in txt.split("\n")]
+
+
+def decode_json(response):
+    """
+    Decode the JSON body of a response, with orjson if it is installed
+    :param response: <requests.Response>
+    :return: <dict/list> : Decoded JSON
+    """
+    if orjson:
+        return orjson.loads(response.content)
+    return response.json()
+
+
+@functools.lru_cache(maxsize=None)
+def record_type(fields):
+    """
+    Compact record class holding only some fields of each JAMA result, so large result sets don't keep every
+    field, meta and link block of every item. Records are namedtuples, so have no per instance dict.
+    :param fields: <tuple of str> : Fields to keep, dotted for nested fields, e.g. ("id", "documentKey", "fields.name")
+    :return: <class> : Record class, with attributes named after the last part of each field, the fields it
+        was made from as its _dotted attribute, and from_json(item) to make a record from a decoded result
+        (None for any missing field)
+    """
+    dotted = tuple(fields)
+    paths = tuple(tuple(field.split(".")) for field in dotted)
+    names = [path[-1] for path in paths]
+    if len(set(names)) != len(names):
+        raise Exception(f"Record fields {fields} do not have unique names")
+    bad = [
+        name
+        for name in names
+        if not name.isidentifier() or keyword.iskeyword(name) or name.startswith("_") or name == "from_json"
+    ]
+    if bad:
+        raise Exception(f"Record fields {fields} have names that can't be attributes: {bad}")
+
+    class ItemRecord(collections.namedtuple("ItemRecord", names)):
+        __slots__ = ()
+        _dotted = dotted
+
+        @classmethod
+        def from_json(cls, item):
+            values = []
+            for path in paths:
+                value = item
+                for key in path:
+                    value = value.get(key) if type(value) is dict else None
+                values.append(value)
+            return cls._make(values)
+
+    return ItemRecord
+
+
+def bucket_activities(activities, keys=("day", "user", "eventType")):
+    """
+    Count activities by any combination of their day (UTC, YYYY-MM-DD), user, eventType, objectType, project and itemType
+    :param activities: <list of dicts> : Activities, e.g. from get_activities
+    :param keys: <tuple of str> : What to count by
+    :return: <Counter> : Counts keyed by tuple of the values of keys
+    """
+    getters = [
+        (lambda act: act["date"][:10]) if key == "day" else (lambda act, key=key: act.get(key))
+        for key in keys
+    ]
+    return collections.Counter(tuple(get(act) for get in getters) for act in activities)
 
 
 class jama:
-    def __init__(self, base_url, username, password, debug=False, retry_delay=2):
+    def __init__(
+        self,
+        base_url,
+        username,
+        password,
+        debug=False,
+        retry_delay=2,
+        pool_size=10,
+        keep_alive=True,
+        headers=None,
+        rate_limit=12,
+        burst=None,
+        limiter=None,
+        page_workers=1,
+        cache=None,
+        lookup_cache=None,
+        lookup_ttl=86400,
+        batch_workers=4,
+        metrics=None,
+        retry_policy=None,
+        coalesce=True,
+    ):
         self.base_url = re.sub("/$", "", base_url)  # remove trailing /
         self.auth = (username, password)
         self.project_id = None
         self.retry_delay = retry_delay
         self.debug = debug
-        self.lookup = self.get_lookup()
+        self.session = self._make_session(pool_size, keep_alive, headers)
+        # Avoiding overload on server: must be 1 per second at most for JAMA hosted instances
+        self.limiter = limiter or TokenBucket(rate_limit, burst)
+        self.page_workers = page_workers  # >1 to fetch ask_big pages concurrently
+        self.batch_workers = batch_workers  # Concurrent requests for batch methods such as get_items
+        self.cache = cache  # Optional ResponseCache for GET requests
+        self.lookup_cache = lookup_cache  # Optional file to keep lookup tables in between runs
+        self.lookup_ttl = lookup_ttl
+        self._lookup = None
+        self._lookup_lock = threading.Lock()
+        self.metrics = metrics or RequestMetrics()
+        self.retry_policy = retry_policy or RetryPolicy()
+        # Identical GETs made at the same time (e.g. by batch workers) share one request
+        self.single_flight = SingleFlight() if coalesce else None
+        if debug:
+            self.metrics.hooks.append(print_request)
         self.users = {}
+        self.checked_out = {}  # Test runs fetched by checkout_runsteps, for checkin_runsteps to reuse
+        self.rendered = {}  # Item id: (modifiedDate, text lines) of the latest version rendered by get_req_texts
+
+    def _make_session(self, pool_size, keep_alive, headers):
+        """
+        Build the pooled HTTP session shared by all reads and writes, so connections are reused between calls
+        :param pool_size: <int> : Number of connections to keep open to the server
+        :param keep_alive: <bool> : Keep connections open between requests (default True)
+        :param headers: <dict> : Extra headers to send with every request
+        :return: <requests.Session>
+        """
+        session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(
+            pool_connections=pool_size, pool_maxsize=pool_size
+        )
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        session.auth = self.auth
+        session.headers.update({"Accept": "application/json"})
+        if not keep_alive:
+            session.headers["Connection"] = "close"
+        if headers:
+            session.headers.update(headers)
+        return session
+
+    def close(self):
+        """
+        Close the pooled connections to the server
+        """
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _send(self, method, full_url, **kwargs):
+        """
+        Send one request through the rate limiter, telling it if we were throttled
+        :param method: <function> : Session method to call
+        :param full_url: <str> : URL to request
+        :return: <requests response>
+        """
+        waited = self.limiter.acquire()
+        started = time.perf_counter()
+        response = method(full_url, **kwargs)
+        self.metrics.record(
+            method.__name__.upper(),
+            full_url,
+            response.status_code,
+            time.perf_counter() - started,
+            len(response.content),
+            waited,
+        )
+        if response.status_code == 429:
+            self.limiter.throttled(retry_after_seconds(response) or self.retry_delay)
+        else:
+            self.limiter.success()
+        return response
+
+    def _send_retrying(self, method, full_url, idempotent=True, **kwargs):
+        """
+        Send a request, retrying connection errors and overload responses as the client's retry_policy allows
+        :param method: <function> : Session method to call
+        :param full_url: <str> : URL to request
+        :param idempotent: <bool> : Request can safely be repeated (GET, PUT, DELETE)
+        :return: <requests response> : The last response, which may still be an overload response
+        """
+        policy = self.retry_policy
+        verb = method.__name__.upper()
+        attempt = 0
+        while True:
+            attempt += 1
+            self.metrics.waited(verb, full_url, policy.wait())
+            try:
+                response = self._send(method, full_url, **kwargs)
+            except requests.exceptions.ConnectionError:
+                delay = policy.delay(attempt)
+                policy.failed(None, delay)
+                if not policy.should_retry(attempt, None, idempotent):
+                    raise
+            else:
+                if response.status_code not in policy.retry_statuses:
+                    policy.succeeded()
+                    return response
+                delay = policy.delay(attempt, retry_after_seconds(response))
+                policy.failed(response.status_code, delay)
+                if not policy.should_retry(attempt, response.status_code, idempotent):
+                    return response
+            self.metrics.retry(verb, full_url)
+            self.metrics.waited(verb, full_url, delay)
+            time.sleep(delay)
 
-    @rate_limited(12)  # Avoiding overload on server: must be 1 per second at most for JAMA hosted instances
     def ask(self, resource):
         """
-        Make a single request to the JAMA REST API, for the named resource, retrying once if we get the throttled response
+        Make a single request to the JAMA REST API, for the named resource, retrying throttled responses and connection errors as the retry_policy allows.
+        If the same resource is already being asked for by another thread, wait for and share its response.
         :param resource:
         :return
         """
         if resource[0] != "/":
             resource = "/" + resource  # add leading / if required
+        if self.single_flight is None:
+            return self._ask(resource)
+        return self.single_flight.do(
+            resource, lambda: self._ask(resource), lambda: self.metrics.coalesced("GET", self.base_url + resource)
+        )
+
+    def _ask(self, resource):
         full_url = self.base_url + resource
-        if self.debug:
-            print(full_url)
-        try:
-            response = requests.get(full_url, auth=self.auth)
-        except requests.exceptions.ConnectionError:
-            response = requests.get(full_url, auth=self.auth)
+        cached, headers = None, {}
+        if self.cache is not None:
+            cached, fresh = self.cache.get(resource)
+            if fresh:
+                return cached
+            if cached is not None:
+                headers = self.cache.conditional_headers(cached)
+        response = self._send_retrying(self.session.get, full_url, headers=headers)
         if response.status_code == 429:
-            print("Retrying JAMA access")
-            time.sleep(self.retry_delay)
-            response = requests.get(full_url, auth=self.auth)
-            if response.status_code == 429:
-                raise Exception("JAMA overload")
+            raise Exception("JAMA overload")
+        if response.status_code == 304 and cached is not None:
+            response = cached  # Not modified since we cached it
         elif response.status_code >= 300:
             raise Exception(f"JAMA API Non-success code {response.status_code} for {full_url}")
+        if self.cache is not None:
+            self.cache.put(resource, response)
         return response
 
     def _request(self, resource, json, rtype, rstr):
         if resource[0] != "/":
             resource = "/" + resource  # add leading / if required
         full_url = self.base_url + resource
-        if self.debug:
-            print(rstr, full_url)
-        response = rtype(full_url, auth=self.auth, json=json)
+        response = self._send_retrying(rtype, full_url, idempotent=rstr != "POST", json=json)
+        if self.single_flight is not None:
+            self.single_flight.forget()  # GETs sent before this write must not answer ones asked after it
+        if self.cache is not None:
+            self.cache.invalidate(resource, json)
         if response.status_code == 401:
             Exception(f"JAMA API Unauthorised when attempting {rstr} as {self.auth[0]}")
         return response
 
     def put(self, resource, json):
-        return self._request(resource, json, requests.put, "PUT")
+        return self._request(resource, json, self.session.put, "PUT")
 
     def post(self, resource, json):
-        return self._request(resource, json, requests.post, "POST")
+        return self._request(resource, json, self.session.post, "POST")
 
     def _delete(self, resource):
-        return self._request(resource, json, requests.delete, "DELETE")
+        return self._request(resource, None, self.session.delete, "DELETE")
 
-    def ask_big(self, resource, args={}, field="data", doseq=False):
+    def _pages(self, resource, args, doseq=False, workers=None, readahead=False, start_at=0):
+        """
+        Generator for the raw response of each page of a resource, in order.
+        Once the first page tells us totalResults, the remaining pages can be fetched by a pool of workers,
+        still within the client's rate limit, with only a few pages in flight at once
+        :param resource: <str> : Endpoint to query
+        :param args: <dict> : Arguments to add to URL
+        :param doseq: <bool> : Expand sequences in args to individual paramters in URL (default False)
+        :param workers: <int> : Number of pages to fetch concurrently (default is client's page_workers)
+        :param readahead: <bool> : Fetch the next pages in the background while the caller handles this one
+        :param start_at: <int> : Offset of first result wanted, to resume an earlier query
+        :return: <generator of dicts> : Decoded JSON response of each page. Raises JamaPagingError if a page fails.
+        """
+        max_results = 50 # JAMA doesn't allow larger pages than 50
+        args = dict(args, maxResults=max_results)
+        workers = workers or self.page_workers
+        fmt = resource + "?"
+
+        pages = []  # Offsets fetched, appended to from workers
+
+        def fetch(start_at):
+            page_args = dict(args, startAt=start_at)
+            pages.append(start_at)
+            return decode_json(self.ask(fmt + urllib.parse.urlencode(page_args, doseq=doseq)))
+
+        try:
+            while True:
+                try:
+                    resp = fetch(start_at)
+                except Exception as e:
+                    raise JamaPagingError(f"{e} (resume from startAt {start_at})", resource, start_at) from e
+                yield resp
+                start_at = start_at + max_results
+                total = resp["meta"]["pageInfo"]["totalResults"]
+                if start_at >= total:
+                    break
+                if workers > 1 or readahead:
+                    offsets = iter(range(start_at, total, max_results))
+                    import concurrent.futures
+
+                    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as pool:
+                        pending = collections.deque(
+                            (offset, pool.submit(fetch, offset))
+                            for offset in itertools.islice(offsets, workers * 2)
+                        )
+                        while pending:
+                            start_at, future = pending.popleft()
+                            try:
+                                resp = future.result()
+                            except Exception as e:
+                                raise JamaPagingError(f"{e} (resume from startAt {start_at})", resource, start_at) from e
+                            offset = next(offsets, None)
+                            if offset is not None:
+                                pending.append((offset, pool.submit(fetch, offset)))
+                            yield resp
+                    break
+        finally:
+            self.metrics.pages(resource, len(pages))
+
+    def _page_items(self, resp, field):
+        """
+        Pick the results out of one page response
+        :param resp: <dict> : Decoded JSON response of the page
+        :param field: <str> : Field to bring into return list, as for ask_big
+        :return: <tuple> : List of results (or dict for a single item), and dict of test case id:documentKey for field "tc"
+        """
+        items = []
+        tcmap = {}
+        try:
+            if field == "linked" and field in resp:
+                items = list(resp[field].get("items", {}).values())
+            if field in ("data", "tc"):
+                items = resp["data"]
+            if field == "tc" and "linked" in resp:
+                tcmap = {jtcid: tc["documentKey"]  for jtcid, tc in resp["linked"].get("items",{}).items()}
+        except KeyError as e:
+            raise Exception(
+                f"Fatal error retrieving data from Jama. This usually means the authentication has failed. KeyError for dictionary: {e}"
+            )
+        return items, tcmap
+
+    @staticmethod
+    def _records(items, fields):
+        """
+        :param items: <list/dict> : Results from _page_items
+        :param fields: <list of str> : Fields to keep, as for record_type, or None to keep the results as they are
+        :return: <list/record> : The results as records
+        """
+        if not fields:
+            return items
+        record = record_type(tuple(fields)).from_json
+        if type(items) is dict:
+            return record(items)
+        return [record(x) for x in items]
+
+    def ask_big(self, resource, args={}, field="data", doseq=False, workers=None, start_at=0, fields=None):
         """
         Make requests from resource, with args specified, handling the pagination until we have everything
         :param resource: <str> : Endpoint to query
         :param args: <dict> : Arguments to add to URL
         :param field: <str> : Field to bring into return list, default is data
         :param doseq: <bool> : Expand sequences in args to individual paramters in URL (default False)
-        :return: <list> :  List of results, or for field "tc", tuple of testcases and results
+        :param workers: <int> : Number of pages to fetch concurrently (default is client's page_workers)
+        :param start_at: <int> : Offset of first result wanted, to resume from a JamaPagingError's start_at
+        :param fields: <list of str> : Only keep these fields of each result, in compact records (see record_type)
+        :return: <list> :  List of results, or for field "tc", tuple of testcases and results.
+            If a page fails, raises JamaPagingError with the results so far, to be resumed from its start_at.
         """
-        start_at = 0
-        max_results = 50 # JAMA doesn't allow larger pages than 50
         data = []
-        args["maxResults"] = max_results
-        fmt = resource + "?"
         tcmap={}
-        while True:
-            args["startAt"] = start_at
-            resp = self.ask(fmt + urllib.parse.urlencode(args, doseq=doseq)).json()
-            try:
-                if field == "linked" and field in resp:
-                    data = data + [y for x, y in resp[field].get("items", {}).items()]
-                if field in ("data", "tc"):
-                    if type(resp["data"]) is dict:
-                        return resp["data"]
-                    data = data + resp["data"]
-                if field == "tc" and "linked" in resp:
-                    tcmap.update({jtcid: tc["documentKey"]  for jtcid, tc in resp["linked"].get("items",{}).items()})
-            except KeyError as e:
-                raise Exception(
-                    f"Fatal error retrieving data from Jama. This usually means the authentication has failed. KeyError for dictionary: {e}"
-                )
-            start_at = start_at + max_results
-            if start_at >= resp["meta"]["pageInfo"]["totalResults"]:
-                break
+        try:
+            for resp in self._pages(resource, args, doseq, workers, start_at=start_at):
+                items, page_tcmap = self._page_items(resp, field)
+                items = self._records(items, fields)
+                if type(items) is not list:
+                    return items
+                data.extend(items)
+                tcmap.update(page_tcmap)
+        except JamaPagingError as e:
+            e.results = (tcmap, data) if field == "tc" else data
+            raise
         if field=="tc":
             return(tcmap, data)
         else:
             return data
 
+    def iter_big(
+        self, resource, args={}, field="data", doseq=False, workers=None, readahead=False, start_at=0, fields=None
+    ):
+        """
+        As ask_big, but yield results page by page as they arrive, rather than holding them all in memory
+        :param resource: <str> : Endpoint to query
+        :param args: <dict> : Arguments to add to URL
+        :param field: <str> : Field to bring into return list, default is data
+        :param doseq: <bool> : Expand sequences in args to individual paramters in URL (default False)
+        :param workers: <int> : Number of pages to fetch concurrently (default is client's page_workers)
+        :param readahead: <bool> : Fetch the next page in the background while the caller handles this one
+        :param start_at: <int> : Offset of first result wanted, to resume from a JamaPagingError's start_at
+        :param fields: <list of str> : Only keep these fields of each result, in compact records (see record_type)
+        :return: <generator> : Each result, or for field "tc", tuples of (testcases on that page, result)
+        """
+        for resp in self._pages(resource, args, doseq, workers, readahead, start_at):
+            items, tcmap = self._page_items(resp, field)
+            items = self._records(items, fields)
+            if type(items) is not list:  # Single item resource
+                yield (tcmap, items) if field == "tc" else items
+                return
+            if field == "tc":
+                for item in items:
+                    yield tcmap, item
+            else:
+                yield from items
+
+    def concurrent(self, func, args, workers=None):
+        """
+        Call func for each of args on a pool of workers (each request still within the client's rate limit)
+        :param func: <function> : Function of one argument
+        :param args: <iterable> : Arguments to call func with
+        :param workers: <int> : Number of concurrent calls (default is client's batch_workers)
+        :return: <list> : Results of func, in the order of args
+        """
+        args = list(args)
+        workers = min(workers or self.batch_workers, len(args))
+        if workers <= 1:
+            return [func(x) for x in args]
+        import concurrent.futures
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as pool:
+            return list(pool.map(func, args))
+
+    def _bulk(self, func, args, workers=None, progress=None):
+        """
+        Call func for each of args concurrently, as concurrent, but collecting failures rather than stopping at the first
+        :param func: <function> : Function of one argument
+        :param args: <iterable> : Arguments to call func with
+        :param workers: <int> : Number of concurrent calls (default is client's batch_workers)
+        :param progress: <function> : Called with (number done, total) as each call finishes
+        :return: <tuple> : List of results in order of args (None where failed), and dict of failed index: error message
+        """
+        args = list(args)
+        failures = {}
+        done = [0]
+        lock = threading.Lock()
+
+        def call(indexed):
+            index, arg = indexed
+            try:
+                return func(arg)
+            except Exception as e:
+                failures[index] = str(e)
+            finally:
+                if progress:
+                    with lock:
+                        done[0] += 1
+                        progress(done[0], len(args))
+
+        return self.concurrent(call, enumerate(args), workers), failures
+
+    @staticmethod
+    def _created_id(resp, what):
+        """
+        Get the ID of a created object from the POST response, or raise an exception saying why there isn't one
+        :param resp: <requests response>
+        :param what: <str> : Description of what was being created, for the exception
+        :return: <int>
+        """
+        try:
+            meta = resp.json()["meta"]
+        except (ValueError, KeyError):
+            raise Exception(f"Creating {what} failed: {resp.status_code} {resp.text}")
+        if resp.status_code >= 300 or "id" not in meta:
+            raise Exception(f"Creating {what} failed: {meta.get('status')} {meta.get('message', '')}")
+        return meta["id"]
+
     def ask_id(self, resource, name, field="name", args={}):
         """
         Get this ID for name from the specified resource, matching the field, with optional args for that resource
@@ -216,16 +1321,30 @@ class jama:
         else:
             raise Exception("JAMA project not set")
 
-    def get_filter_results(self, filter_id, project=None):
+    def get_filter_results(self, filter_id, project=None, fields=None):
         """
         Give me the items from the name / id of the filter
         :param filter_id: <int/str> JAMA Filter name or ID
         :param project: <int> : JAMA Project ID (defaults to set project)
+        :param fields: <list of str> : Only keep these fields of each item, in compact records (see record_type)
         :return: <list> : requirements matching filter
         """
         if type(filter_id) is str:
             filter_id = self.find_filter_id(filter_id, project)
-        return self.ask_big(f"/filters/{filter_id}/results")
+        return self.ask_big(f"/filters/{filter_id}/results", fields=fields)
+
+    def iter_filter_results(self, filter_id, project=None, readahead=True, fields=None):
+        """
+        Generator for the items from the name / id of the filter, as they arrive
+        :param filter_id: <int/str> JAMA Filter name or ID
+        :param project: <int> : JAMA Project ID (defaults to set project)
+        :param readahead: <bool> : Fetch the next page while this one is handled (default True)
+        :param fields: <list of str> : Only keep these fields of each item, in compact records (see record_type)
+        :return: <generator of dicts> : requirements matching filter
+        """
+        if type(filter_id) is str:
+            filter_id = self.find_filter_id(filter_id, project)
+        return self.iter_big(f"/filters/{filter_id}/results", readahead=readahead, fields=fields)
 
     def get_downstream(self, item, args={}):
         """
@@ -294,6 +1413,44 @@ class jama:
         data = self.ask_big(f"/items/{item}/tags", args)
         return data
 
+    @property
+    def lookup(self):
+        """
+        Lookup tables of custom values, as from get_lookup, fetched on first use (or read from lookup_cache file)
+        """
+        if self._lookup is None:
+            with self._lookup_lock:
+                if self._lookup is None:
+                    self._lookup = self._load_lookup()
+        return self._lookup
+
+    @lookup.setter
+    def lookup(self, value):
+        self._lookup = value
+
+    def _load_lookup(self):
+        """
+        Get the lookup tables from the lookup_cache file if it is recent enough and for this server and project,
+        else from JAMA, saving them to the file
+        :return: <dict>
+        """
+        key = [self.base_url, self.project_id]
+        if self.lookup_cache:
+            try:
+                with open(self.lookup_cache) as f:
+                    saved = json.load(f)
+                if saved["key"] == key and time.time() - saved["saved"] < self.lookup_ttl:
+                    return dict(saved["lookup"])  # Stored as pairs, as keys are a mix of ints and strings
+            except (OSError, ValueError, KeyError, TypeError):
+                pass
+        lookup = self.get_lookup()
+        if self.lookup_cache:
+            tmp = f"{self.lookup_cache}.{os.getpid()}.tmp"
+            with open(tmp, "w") as f:
+                json.dump({"key": key, "saved": time.time(), "lookup": list(lookup.items())}, f)
+            os.replace(tmp, self.lookup_cache)
+        return lookup
+
     def get_lookup(self, picklists=["Status"], project=None):
         """
         For the current project, get a big dict of all the custom values mapping to the appropriate strings, given the picklists chosen
@@ -322,6 +1479,28 @@ class jama:
         """
         return self.ask_big("/abstractitems", {"documentKey": req_id})
 
+    def find_req_ids(self, req_ids, chunk_size=50, workers=None):
+        """
+        For many JAMA requirement text IDs, return matches, asking for chunk_size of them in each query
+        :param req_ids: <list of str>
+        :param chunk_size: <int> : Number of documentKeys per query
+        :param workers: <int> : Number of concurrent queries (default is client's batch_workers)
+        :return: <dict> : Dict of documentKey: list of matches
+        """
+        req_ids = list(dict.fromkeys(req_ids))  # Unique, keeping order
+        results = {req_id: [] for req_id in req_ids}
+        chunks = [req_ids[i : i + chunk_size] for i in range(0, len(req_ids), chunk_size)]
+        for items in self.concurrent(
+            lambda chunk: self.ask_big("/abstractitems", {"documentKey": chunk}, doseq=True),
+            chunks,
+            workers,
+        ):
+            for item in items:
+                key = item.get("documentKey") or item["fields"].get("documentKey")
+                if key in results:
+                    results[key].append(item)
+        return results
+
     def find_item_id(self, item_id):
         """
         For a JAMA text ID, return matches
@@ -344,7 +1523,7 @@ class jama:
             {
                 "itemType": self.lookup["Test Case"],
                 "project": project,
-                "contains": [tcname],
+                "contains": tcname,
             },
         )
 
@@ -356,16 +1535,32 @@ class jama:
         :param project: <int> : Project to search, default is current set project
         :return: <list>
         """
+        return self.ask_big("/abstractitems", self._name_criteria(name, itemtype, project))
+
+    def iter_by_name(self, name, itemtype=None, project=None, readahead=True):
+        """
+        Generator for matching items, as they arrive
+        :param name: <str> :  Test case name to find
+        :param itemtype: <str/int> :  Item type to find
+        :param project: <int> : Project to search, default is current set project
+        :param readahead: <bool> : Fetch the next page while this one is handled (default True)
+        :return: <generator of dicts>
+        """
+        return self.iter_big(
+            "/abstractitems", self._name_criteria(name, itemtype, project), readahead=readahead
+        )
+
+    def _name_criteria(self, name, itemtype, project):
         if not project:
             project = self.project_id
-        criteria = {"contains": [name], "project": project}
+        criteria = {"contains": name, "project": project}
         if itemtype:
             if type(itemtype) is str:
                 if itemtype in self.lookup:
                     criteria["itemType"] = self.lookup[itemtype]
             else:
                 criteria["itemType"] = itemtype
-        return self.ask_big("/abstractitems", criteria)
+        return criteria
 
     def find_uniqid(self, uniqid):
         """
@@ -376,6 +1571,32 @@ class jama:
         resp = self.ask(f"/abstractitems/{uniqid}").json()
         return resp["data"]["documentKey"]
 
+    def get_items(self, uniqids, workers=None):
+        """
+        Given many JAMA API int ids, return their items.
+        The API cannot select abstractitems by id, so these are fetched concurrently, one request each
+        :param uniqids: <list of ints> : Items to find
+        :param workers: <int> : Number of concurrent requests (default is client's batch_workers)
+        :return: <dict> : Dict of id: item
+        """
+        uniqids = list(dict.fromkeys(uniqids))
+        items = self.concurrent(
+            lambda uniqid: self.ask_big(f"/abstractitems/{uniqid}"), uniqids, workers
+        )
+        return dict(zip(uniqids, items))
+
+    def find_uniqids(self, uniqids, workers=None):
+        """
+        Given many JAMA API int ids, return their JAMA string IDs
+        :param uniqids: <list of ints> : Items to find
+        :param workers: <int> : Number of concurrent requests (default is client's batch_workers)
+        :return: <dict> : Dict of id: JAMA string ID
+        """
+        return {
+            uniqid: item["documentKey"]
+            for uniqid, item in self.get_items(uniqids, workers).items()
+        }
+
     def testrun_islocked(self, test_id):
         """
         Check if test run is locked
@@ -398,15 +1619,17 @@ class jama:
         """
         Lock test run
         :param test_id: <int> : Test run ID
+        :return: <requests response> : status 300 or more if not locked, e.g. 409 if locked by someone else
         """
-        self.setlock_testrun(test_id, True)
+        return self.setlock_testrun(test_id, True)
 
     def unlock_testrun(self, test_id):
         """
         Unlock test run
         :param test_id: <int> : Test run ID
+        :return: <requests response>
         """
-        self.setlock_testrun(test_id, False)
+        return self.setlock_testrun(test_id, False)
 
     def create_testcase(self, parent_id, name, description, steps, project=None):
         """
@@ -426,9 +1649,18 @@ class jama:
         if type(parent_id) is str:
             parent_id = self.find_item_id(parent_id)
 
+        json = self._testcase_json(project, parent_id, name, description, steps)
+        resp = self.post("/items", json)
+        try:
+            test_case = resp.json()["meta"]["id"]
+        except KeyError:
+            print("NO ID RETURNED:", resp.json())
+        return test_case
+
+    def _testcase_json(self, project, parent_id, name, description, steps):
         tc_item = self.lookup["Test Case"]
         fields = {"description": description, "name": name, "testCaseSteps": steps}
-        json = {
+        return {
             "project": project,
             "itemType": tc_item,
             "childItemType": tc_item,
@@ -436,26 +1668,71 @@ class jama:
             "fields": fields,
         }
 
-        resp = self.post("/items", json)
-        try:
-            test_case = resp.json()["meta"]["id"]
-        except KeyError:
-            print("NO ID RETURNED:", resp.json())
-        return test_case
+    def create_testcases(self, specs, parent_id=None, project=None, workers=None, progress=None):
+        """
+        Create many new test cases concurrently, resolving each parent and project only once
+        :param specs: <list of dicts> : Each with name, description and steps as for create_testcase, and optionally parent_id
+        :param parent_id: <int/string> : The parent JAMA item for specs that don't give one
+        :param project: <int/string> : The project to create test cases in, defaults to set project
+        :param workers: <int> : Number of concurrent requests (default is client's batch_workers)
+        :param progress: <function> : Called with (number done, total) as each test case is created
+        :return: <tuple> : List of ids of created test cases in order of specs (None where failed), and dict of failed index: error message
+        """
+        if not project:
+            project = self.project_id
+        if type(project) is str:
+            project = self.get_project_id(project)
+        specs = list(specs)
+        parents = {spec.get("parent_id", parent_id) for spec in specs}
+        parent_ids = {parent: parent for parent in parents if type(parent) is not str}
+        for key, matches in self.find_req_ids([x for x in parents if type(x) is str]).items():
+            if len(matches) != 1:
+                raise Exception(f"Ambiguous/empty match for parent {key}")
+            parent_ids[key] = matches[0]["id"]
+        self.lookup  # Load before the workers need it
+
+        def create(spec):
+            json = self._testcase_json(
+                project,
+                parent_ids[spec.get("parent_id", parent_id)],
+                spec["name"],
+                spec["description"],
+                spec["steps"],
+            )
+            return self._created_id(self.post("/items", json), f"test case {spec['name']}")
+
+        return self._bulk(create, specs, workers, progress)
 
-    def search(self, contains, item_type=None):
+    def search(self, contains, item_type=None, fields=None):
         """
         Find items that match a string
         :param contains: <string> : String to search for within items
         :param item_type: <int/string> : The type of item to search for (default: all)
+        :param fields: <list of str> : Only keep these fields of each item, in compact records (see record_type)
         :return: <list of dicts> : search results
         """
+        return self.ask_big("/abstractitems", self._search_criteria(contains, item_type), fields=fields)
+
+    def iter_search(self, contains, item_type=None, readahead=True, fields=None):
+        """
+        Generator for items that match a string, as they arrive
+        :param contains: <string> : String to search for within items
+        :param item_type: <int/string> : The type of item to search for (default: all)
+        :param readahead: <bool> : Fetch the next page while this one is handled (default True)
+        :param fields: <list of str> : Only keep these fields of each item, in compact records (see record_type)
+        :return: <generator of dicts> : search results
+        """
+        return self.iter_big(
+            "/abstractitems", self._search_criteria(contains, item_type), readahead=readahead, fields=fields
+        )
+
+    def _search_criteria(self, contains, item_type):
         if type(item_type) is str:
             item_type = self.lookup[item_type]
         criteria = {"contains": contains}
         if item_type:
             criteria["itemType"] = item_type
-        return self.ask_big("/abstractitems", criteria)
+        return criteria
 
     def create_testplan(self, name, project=None):
         """
@@ -536,15 +1813,34 @@ class jama:
         :param group: <int> : The group to create test case in, defaults to default group
         :return: <int> : Returns the test group added to
         """
+        group, failures = self.add_testcases_to_plan(plan, tests, group)
+        for index, message in failures.items():
+            print(f"Adding test case {tests[index]} to plan {plan}: {message}")
+        return group
+
+    def add_testcases_to_plan(self, plan, tests, group=None, workers=None, progress=None):
+        """
+        add test cases to plan concurrently, reporting which failed
+        :param plan: <int> : The parent JAMA item to add test case to
+        :param tests: <list of ints> : The test cases to add.
+        :param group: <int> : The group to create test case in, defaults to default group
+        :param workers: <int> : Number of concurrent requests (default is client's batch_workers)
+        :param progress: <function> : Called with (number done, total) as each test case is added
+        :return: <tuple> : The test group added to, and dict of failed index in tests: error message
+        """
         if not group:
             groups = self.get_plangroups(plan)
             group = groups[0]["id"]
-        for test in tests:
-            json = {"testCase": test}
+
+        def add(test):
             response = self.post(
-                f"/testplans/{plan}/testgroups/{group}/testcases", json
+                f"/testplans/{plan}/testgroups/{group}/testcases", {"testCase": test}
             )
-        return group
+            if response.status_code >= 300:
+                raise Exception(f"{response.status_code} {response.text}")
+
+        _, failures = self._bulk(add, tests, workers, progress)
+        return group, failures
 
     def create_testcycle(
         self,
@@ -621,14 +1917,43 @@ class jama:
             self.users[key] = user_id
             return user_id
 
+    def find_users(self, names):
+        """
+        Given many names, look up the user IDs, with one listing of all users for any not already known
+        :param names: <list of str> : Full names of users, as "first last"
+        :return: <dict> : Dict of name: JAMA User ID, None for names with no user
+        """
+        keys = {name: self._user_key(name) for name in names}
+        if any(key not in self.users for key in keys.values()):
+            for user in self.ask_big("/users", args={"includeInactive": True}):
+                self.users.setdefault((user["firstName"], user["lastName"]), user["id"])
+
+        def user_id(key):
+            if key in self.users:
+                return self.users[key]
+            try:
+                return self.find_user(*key)
+            except IndexError:  # No such user
+                return None
+
+        return {name: user_id(key) for name, key in keys.items()}
+
+    @staticmethod
+    def _user_key(name):
+        names = name.split(" ")
+        return names[0], " ".join(names[1:])
+
     def checkout_runsteps(self, testrun):
         """
         checked out a run's steps so we can update them
         :param testrun: <int> : The id of the test run
         :return: <list of dicts> : The steps to be executed
         """
-        self.lock_testrun(testrun)
+        resp = self.lock_testrun(testrun)
+        if resp.status_code >= 300:
+            raise Exception(f"Could not lock test run {testrun}: {resp.status_code} {resp.text}")
         run = self.ask_big(f"/testruns/{testrun}")
+        self.checked_out[testrun] = run
         f = run["fields"]
         if self.debug:
             print(f"Retrieved testrun {testrun} with {len(f['testRunSteps'])} steps")
@@ -642,22 +1967,12 @@ class jama:
         :param tester: <int/str> : id or name of tester assigned to the run
         :param resulttext: <string> : Rich text of any other info for test run
         """
-        data = self.ask_big(f"/testruns/{testrun}")
-        fields = data["fields"]
-        try:
-            del fields["testRunStatus"]
-            del fields["executionDate"]
-        except KeyError:
-            pass
-        fields["testRunSteps"] = steps
-        if tester:
-            if type(tester) is str:
-                names = tester.split(" ")
-                tester = self.find_user(names[0], " ".join(names[1:]))
-            fields["assignedTo"] = tester
-        if resulttext:
-            fields["actualResults"] = resulttext
-        resp = self.put(f"/testruns/{testrun}", {"fields": fields}).json()
+        data = self.checked_out.pop(testrun, None) or self.ask_big(f"/testruns/{testrun}")
+        if type(tester) is str:
+            tester = self.find_user(*self._user_key(tester))
+        resp = self.put(
+            f"/testruns/{testrun}", {"fields": self._checkin_fields(data, steps, tester, resulttext)}
+        ).json()
         self.unlock_testrun(testrun)
         if resp["meta"]["status"] == "Bad Request":
             raise Exception(
@@ -665,15 +1980,94 @@ class jama:
             )
         return resp
 
-    def get_testruns(self, cycle):
+    @staticmethod
+    def _checkin_fields(run, steps, tester=None, resulttext=None):
+        """
+        Fields to PUT back to a test run to record its results
+        :param run: <dict> : The test run as fetched
+        :param steps: <list of dicts> : Array (for each step) of dicts, each step having fields "result" and "status"
+        :param tester: <int> : id of tester assigned to the run
+        :param resulttext: <string> : Rich text of any other info for test run
+        :return: <dict>
+        """
+        fields = dict(run["fields"])
+        fields.pop("testRunStatus", None)
+        fields.pop("executionDate", None)
+        fields["testRunSteps"] = steps
+        if tester:
+            fields["assignedTo"] = tester
+        if resulttext:
+            fields["actualResults"] = resulttext
+        return fields
+
+    def publish_runs(self, results, workers=None, progress=None):
+        """
+        Record the results of many test runs concurrently. Each run is locked, fetched under the lock, updated and
+        unlocked, and is always unlocked again if anything fails. A run already locked by someone else fails.
+        Runs checked out by checkout_runsteps are already locked, so their checked out state is used.
+        Testers given by name are looked up together first; runs with an unknown tester fail.
+        :param results: <dict> : Dict of test run id: dict with "steps" (as for checkin_runsteps), and optionally "tester" and "resulttext"
+        :param workers: <int> : Number of runs to publish at once (default is client's batch_workers)
+        :param progress: <function> : Called with (number done, total) as each run is published
+        :return: <tuple> : Dict of test run id: checkin response for those published, and dict of test run id: error message for those that failed
+        """
+        testers = self.find_users(
+            {x["tester"] for x in results.values() if type(x.get("tester")) is str}
+        )
+        unknown = {
+            testrun: f"Unknown tester {result['tester']}"
+            for testrun, result in results.items()
+            if type(result.get("tester")) is str and testers[result["tester"]] is None
+        }
+
+        def publish(testrun):
+            result = results[testrun]
+            tester = result.get("tester")
+            run = self.checked_out.pop(testrun, None)
+            if run is None:
+                resp = self.lock_testrun(testrun)
+                if resp.status_code >= 300:
+                    raise Exception(f"Could not lock test run {testrun}: {resp.status_code} {resp.text}")
+            try:
+                if run is None:
+                    run = self.ask_big(f"/testruns/{testrun}")  # After locking, so no one else's update is lost
+                fields = self._checkin_fields(
+                    run, result["steps"], testers.get(tester, tester), result.get("resulttext")
+                )
+                resp = self.put(f"/testruns/{testrun}", {"fields": fields}).json()
+            finally:
+                self.unlock_testrun(testrun)
+            if resp["meta"]["status"] == "Bad Request":
+                raise Exception(resp["meta"]["message"])
+            return resp
+
+        testruns = [testrun for testrun in results if testrun not in unknown]
+        responses, failures = self._bulk(publish, testruns, workers, progress)
+        return (
+            {run: resp for index, (run, resp) in enumerate(zip(testruns, responses)) if index not in failures},
+            {**unknown, **{testruns[index]: message for index, message in failures.items()}},
+        )
+
+    def get_testruns(self, cycle, fields=None):
         """
         Get all testruns for a test cycle
         :param cycle: <int> : The id of the test run
+        :param fields: <list of str> : Only keep these fields of each test run, in compact records (see record_type)
         :return: <list> : List of test runs
         """
-        data = self.ask_big(f"/testcycles/{cycle}/testruns")
+        data = self.ask_big(f"/testcycles/{cycle}/testruns", fields=fields)
         return data
 
+    def iter_testruns(self, cycle, readahead=True, fields=None):
+        """
+        Generator for all testruns for a test cycle, as they arrive
+        :param cycle: <int> : The id of the test run
+        :param readahead: <bool> : Fetch the next page while this one is handled (default True)
+        :param fields: <list of str> : Only keep these fields of each test run, in compact records (see record_type)
+        :return: <generator of dicts> : Test runs
+        """
+        return self.iter_big(f"/testcycles/{cycle}/testruns", readahead=readahead, fields=fields)
+
     def get_testrunsx(self, cycle):
         """
         Get all testruns for a test cycle, with the test case info
@@ -687,6 +2081,20 @@ class jama:
         )
         return data
 
+    def iter_testrunsx(self, cycle, readahead=True):
+        """
+        Generator for all testruns for a test cycle, with the test case info, as they arrive
+        :param cycle: <int> : The id of the test run
+        :param readahead: <bool> : Fetch the next page while this one is handled (default True)
+        :return: <generator of tuples> : Test cases id:documentKey on the run's page, and the test run
+        """
+        return self.iter_big(
+            f"/testcycles/{cycle}/testruns",
+            field="tc",
+            args={"include": "data.fields.testCase"},
+            readahead=readahead,
+        )
+
     def get_testgroups(self, plan):
         """
         Get all testgroups for a test plan
@@ -714,23 +2122,111 @@ class jama:
         data = self.ask_big("/users", args={"includeInactive" : include_inactive})
         return {x["id"]: f"{x['firstName']} {x['lastName']}" for x in data}
 
+    def get_activities(
+        self,
+        startdate,
+        enddate,
+        projects=None,
+        event_types=("UPDATE", "DELETE", "CREATE"),
+        window_days=31,
+        workers=None,
+    ):
+        """
+        Get all the activities between two dates, asking for window_days at a time for each project, with projects and windows fetched concurrently
+        :param startdate: <date/YYYY-MM-DD string> : First day to include
+        :param enddate: <date/YYYY-MM-DD string> : Last day to include
+        :param projects: <list of ints> : Projects to include, default all
+        :param event_types: <list of str> : Event types to include, default UPDATE, DELETE and CREATE
+        :param window_days: <int> : Days to ask for in each query
+        :param workers: <int> : Number of concurrent queries (default is client's batch_workers)
+        :return: <list of dicts> : Activities
+        """
+        from datetime import date, timedelta
+
+        if type(startdate) is str:
+            startdate = date.fromisoformat(startdate)
+        if type(enddate) is str:
+            enddate = date.fromisoformat(enddate)
+        if projects is None:
+            projects = [x["id"] for x in self.ask_big("/projects")]
+        windows = []
+        start = startdate
+        while start <= enddate:
+            end = min(enddate, start + timedelta(days=window_days - 1))
+            windows.append((start, end))
+            start = end + timedelta(days=1)
+
+        def fetch(query):
+            project, (start, end) = query
+            return self.ask_big(
+                "/activities",
+                doseq=True,
+                args={
+                    "project": project,
+                    "date": [f"{start.isoformat()}T00:00:00Z", f"{end.isoformat()}T23:59:59Z"],
+                    "eventType": list(event_types),
+                },
+            )
+
+        queries = [(project, window) for project in projects for window in windows]
+        return [act for acts in self.concurrent(fetch, queries, workers) for act in acts]
+
     def get_req_text(self, req_id):
         """
         Get rendered version of requirement text
         :param req_id: <str> : Requirement identifier
         :return: <list> : rendered text lines from requirement
         """
-        results = self.find_req_id(req_id)
-        if len(results) != 1:
-            print(f"Ambiguous/empty match for requirement {req_id}")
-            return []
+        return self.get_req_texts([req_id]).get(req_id, [])
+
+    def get_req_texts(self, reqs, workers=None, processes=0, process_batch=500, pool=None):
+        """
+        Get rendered versions of many requirements' text, fetching those given by documentKey in bulk.
+        Each item is only rendered again once it has been modified, and big batches can be rendered by a pool of processes.
+        :param reqs: <list of str/dicts> : Requirement identifiers, or items already fetched
+        :param workers: <int> : Number of concurrent queries (default is client's batch_workers)
+        :param processes: <int> : Number of processes to render big batches with (default 0, render in this process;
+            None for one per CPU). They are spawned, so the calling script needs the usual if __name__ == '__main__'
+            guard, and each imports the HTML parser again.
+        :param process_batch: <int> : Fewest texts to render worth starting processes for
+        :param pool: <concurrent.futures.Executor> : Pool to render big batches in, rather than starting one each call
+        :return: <dict> : documentKey: rendered text lines, for each requirement found
+        """
+        items = [x for x in reqs if type(x) is dict]
+        for req_id, results in self.find_req_ids([x for x in reqs if type(x) is str], workers=workers).items():
+            if len(results) != 1:
+                print(f"Ambiguous/empty match for requirement {req_id}")
+            else:
+                items.append(results[0])
+        texts = {}
+        todo = {}  # Item id: (documentKey, modifiedDate, HTML) for those not already rendered
+        for item in items:
+            key = item.get("documentKey") or item["fields"].get("documentKey")
+            modified = item.get("modifiedDate")
+            done = self.rendered.get(item["id"])
+            if done and done[0] == modified:
+                texts[key] = done[1]
+            else:
+                todo[item["id"]] = (key, modified, item["fields"].get("description") or "")
+        html = [x[2] for x in todo.values()]
+        if pool is not None and len(html) >= process_batch:
+            rendered = list(pool.map(html_to_lines, html, chunksize=64))
+        elif processes != 0 and len(html) >= process_batch:
+            import concurrent.futures
+            import multiprocessing
+
+            # Spawned, as forking a process that is running thread pools can deadlock the child
+            with concurrent.futures.ProcessPoolExecutor(
+                processes, mp_context=multiprocessing.get_context("spawn")
+            ) as new_pool:
+                rendered = list(new_pool.map(html_to_lines, html, chunksize=64))
         else:
-            contents_string = results[0]["fields"]["description"]
-            bs = BeautifulSoup(
-                contents_string, convertEntities=BeautifulSoup.HTML_ENTITIES
-            )
-            txt = bs.getText("\n")
-            return [re.sub("[\r\n]*$", "", x) for x in txt.split("\n")]
+            rendered = [html_to_lines(x) for x in html]
+        for (item, (key, modified, _)), lines in zip(todo.items(), rendered):
+            if modified:  # Without it we can't tell when the item changes
+                self.rendered[item] = (modified, lines)
+            texts[key] = lines
+        return texts
 
     def create_link(self, item, url, description):
         """
@@ -760,6 +2256,99 @@ class jama:
             raise Exception(f"create_relationship ERROR: {resp['meta']['message']}")
         return resp
 
+    def delete_relationship(self, relationship):
+        """
+        Delete a relationship
+        :param relationship: <int> : JAMA ID of relationship
+        :return: <requests response>
+        """
+        resp = self._delete(f"/relationships/{relationship}")
+        if resp.status_code >= 300:
+            raise Exception(f"delete_relationship ERROR: {resp.status_code} {resp.text}")
+        return resp
+
+    def get_relationships(self, project=None, items=None, workers=None):
+        """
+        Get relationships in bulk, as compact records of id, fromItem, toItem and relationshipType
+        :param project: <int> : Get all of the project's relationships (defaults to set project)
+        :param items: <list of ints> : Instead get just the relationships downstream of these items
+        :param workers: <int> : Number of concurrent queries for items (default is client's batch_workers)
+        :return: <list of records>
+        """
+        fields = ["id", "fromItem", "toItem", "relationshipType"]
+        if items is not None:
+            found = self.concurrent(
+                lambda item: self.ask_big(f"/items/{item}/downstreamrelationships", fields=fields), items, workers
+            )
+            return [rel for rels in found for rel in rels]
+        if not project:
+            project = self.project_id
+        if not project:
+            raise Exception("JAMA project not set")
+        return self.ask_big("/relationships", {"project": project}, workers=workers, fields=fields)
+
+    def sync_relationships(self, edges, project=None, items=None, delete=True, dry_run=False, workers=None, progress=None):
+        """
+        Make the relationships in a scope match the edges wanted, creating and deleting only what differs.
+        The scope's existing relationships are read in bulk and compared locally, so a re-run with nothing to change
+        only costs the reads. An edge with no relationship type matches an existing relationship of any type.
+        :param edges: <iterable of tuples> : (fromItem, toItem, relationshipType or None) wanted
+        :param project: <int> : Scope is all of the project's relationships (defaults to set project)
+        :param items: <list of ints> : Instead scope is the relationships downstream of these items
+        :param delete: <bool> : Delete relationships in scope that aren't wanted (default True)
+        :param dry_run: <bool> : Work out the changes without making them
+        :param workers: <int> : Number of concurrent requests (default is client's batch_workers)
+        :param progress: <function> : Called with (number done, total) as each change is made
+        :return: <tuple> : List of (fromItem, toItem, relationshipType) created, list of relationship IDs deleted,
+            and dict of failures: edge or relationship ID: error message
+        """
+        edges = list(dict.fromkeys(tuple(edge) + (None,) * (3 - len(edge)) for edge in edges))
+        if items is not None:
+            scope = set(items)
+            outside = [edge for edge in edges if edge[0] not in scope]
+            if outside:
+                # They would never be found in scope, so would be created again on every run
+                raise Exception(f"sync_relationships: {len(outside)} edges from items not in scope, e.g. {outside[0]}")
+        existing = collections.defaultdict(list)  # (fromItem, toItem): list of (relationshipType, id)
+        for rel in self.get_relationships(project, items, workers):
+            existing[(rel.fromItem, rel.toItem)].append((rel.relationshipType or None, rel.id))
+        to_create = []
+        for edge in edges:
+            upstream, downstream, relationship_type = edge
+            found = existing.get((upstream, downstream), [])
+            match = next(
+                (x for x in found if relationship_type is None or x[0] == relationship_type), None
+            )
+            if match:
+                found.remove(match)  # Kept; any left over are unwanted
+            else:
+                to_create.append(edge)
+        ends = {rel: end for end, found in existing.items() for _, rel in found}
+        to_delete = list(ends) if delete else []
+        if dry_run:
+            return to_create, to_delete, {}
+
+        def change(action):
+            kind, arg = action
+            if kind == "create":
+                json = {"fromItem": arg[0], "toItem": arg[1]}
+                if arg[2]:
+                    json["relationshipType"] = arg[2]
+                self._created_id(self.post("/relationships", json), f"relationship {arg}")
+            else:
+                self.delete_relationship(arg)
+
+        actions = [("create", edge) for edge in to_create] + [("delete", rel) for rel in to_delete]
+        _, failed = self._bulk(change, actions, workers, progress)
+        failures = {actions[index][1]: message for index, message in failed.items()}
+        created = [edge for edge in to_create if edge not in failures]
+        deleted = [rel for rel in to_delete if rel not in failures]
+        if self.cache is not None:
+            # A DELETE doesn't say which items' relationship pages it changed
+            for rel in deleted:
+                self.cache.invalidate(f"/relationships/{rel}", dict(zip(("fromItem", "toItem"), ends[rel])))
+        return created, deleted, failures
+
     def remove_testrun(self, testrun):
         """
         Delete a test run
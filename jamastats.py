@@ -0,0 +1,214 @@
+"""
+Test execution statistics for a whole JAMA test plan
+Fetches every cycle's test runs concurrently into a compact array-backed table, one row per run, then rolls them up:
+latest status of each test case, pass rates by group or cycle, and flaky tests. Runs are sorted into each test case's
+execution order once, with NumPy if it is installed, and that order is shared by the rollups.
+
+Usage:
+    table = plan_test_runs(jam, plan=1234)
+    table.pass_rates("group")  # {group ID: fraction of executed runs passed}
+    table.latest_status()  # {test case documentKey: status}
+    table.flaky()  # {test case documentKey: number of PASSED/FAILED flips}
+
+The MIT licence:
+Copyright (c) 2016-2019 Optos plc
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated documentation files (the "Software"), to deal in the Software without restriction, including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+import collections
+from array import array
+import re
+from datetime import datetime, timezone
+
+STATUSES = ["NOT_RUN", "PASSED", "FAILED", "BLOCKED", "INPROGRESS", "SCHEDULED"]
+EXECUTED = ("PASSED", "FAILED", "BLOCKED")  # Statuses counted by pass rates
+RUN_FIELDS = [
+    "id",
+    "fields.testCycle",
+    "fields.testCase",
+    "fields.testRunStatus",
+    "fields.assignedTo",
+    "fields.executionDate",
+]
+
+
+def timestamp(date_string):
+    """
+    :param date_string: <str> : JAMA date or date time, e.g. "2019-04-15T10:00:00.000+0000", dates taken as UTC
+    :return: <float> : POSIX timestamp, NaN if none
+    """
+    if not date_string:
+        return float("nan")
+    if "T" not in date_string:
+        return datetime.strptime(date_string, "%Y-%m-%d").replace(tzinfo=timezone.utc).timestamp()
+    # Offset as +HHMM (UTC if none) and seconds with a fraction, so one format fits, as %z varies by Python version
+    date_time, offset = re.fullmatch(r"(.*?)(Z|[+-]\d\d:?\d\d)?", date_string).groups()
+    offset = "+0000" if offset in (None, "Z") else offset.replace(":", "")
+    if "." not in date_time:
+        date_time += ".0"
+    return datetime.strptime(date_time + offset, "%Y-%m-%dT%H:%M:%S.%f%z").timestamp()
+
+
+class TestRunTable:
+    """
+    Test runs held as arrays: row n is run runs[n], in cycle cycles[n] and group groups[n] (0 if not known),
+    of test case cases[n], with status statuses[self.status_codes[n]], assigned to user assignees[n] (0 if none)
+    and executed at POSIX time executed[n] (NaN if not yet)
+    """
+
+    def __init__(self):
+        self.runs = array("q")
+        self.cycles = array("q")
+        self.groups = array("q")
+        self.cases = array("q")
+        self.status_codes = array("b")
+        self.assignees = array("q")
+        self.executed = array("d")
+        self.statuses = list(STATUSES)
+        self.status_index = {status: n for n, status in enumerate(self.statuses)}
+        self.documentKeys = {}  # Test case JAMA ID: documentKey
+        self.case_rows = None  # Cache of _by_case_in_order, dropped when a run is added
+
+    def __len__(self):
+        return len(self.runs)
+
+    def _status_code(self, status):
+        code = self.status_index.get(status)
+        if code is None:
+            code = self.status_index[status] = len(self.statuses)
+            self.statuses.append(status)
+        return code
+
+    def add_run(self, run, group=0):
+        """
+        :param run: <record> : Test run with the RUN_FIELDS
+        :param group: <int> : JAMA ID of the run's test group
+        """
+        self.runs.append(run.id)
+        self.cycles.append(run.testCycle or 0)
+        self.groups.append(group or 0)
+        self.cases.append(run.testCase or 0)
+        self.status_codes.append(self._status_code(run.testRunStatus or "NOT_RUN"))
+        self.assignees.append(run.assignedTo or 0)
+        self.executed.append(timestamp(run.executionDate))
+        self.case_rows = None
+
+    def _case_key(self, case):
+        return self.documentKeys.get(case, case)
+
+    def status_counts(self, by="cycle"):
+        """
+        :param by: <str> : "cycle", "group", "case" or "assignee"
+        :return: <dict> : cycle/group/test case documentKey/user ID: Counter of status: number of runs
+        """
+        keys = {"cycle": self.cycles, "group": self.groups, "case": self.cases, "assignee": self.assignees}[by]
+        counts = collections.defaultdict(collections.Counter)
+        for key, code in zip(keys, self.status_codes):
+            counts[key][code] += 1
+        return {
+            self._case_key(key) if by == "case" else key: collections.Counter(
+                {self.statuses[code]: n for code, n in counter.items()}
+            )
+            for key, counter in counts.items()
+        }
+
+    def pass_rates(self, by="cycle"):
+        """
+        :param by: <str> : "cycle", "group", "case" or "assignee"
+        :return: <dict> : cycle/group/test case documentKey/user ID: fraction of executed runs that passed
+            (None if none executed)
+        """
+        rates = {}
+        for key, counts in self.status_counts(by).items():
+            executed = sum(counts[status] for status in EXECUTED)
+            rates[key] = counts["PASSED"] / executed if executed else None
+        return rates
+
+    def _by_case_in_order(self):
+        """
+        :return: <dict> : Test case JAMA ID: list of row numbers of its executed runs, oldest first
+        """
+        if self.case_rows is not None:
+            return self.case_rows
+        try:
+            import numpy  # Optional, sorts much faster
+        except ImportError:
+            numpy = None
+        rows = {}
+        if numpy is not None:
+            # Copies, as arrays can't grow while NumPy views them
+            executed, runs, cases = numpy.array(self.executed), numpy.array(self.runs), numpy.array(self.cases)
+            done = numpy.flatnonzero(~numpy.isnan(executed))
+            order = done[numpy.lexsort((runs[done], executed[done], cases[done]))]  # By case, then time, then run
+            ordered_cases = cases[order]
+            starts = numpy.flatnonzero(numpy.diff(ordered_cases, prepend=ordered_cases[:1] - 1))
+            for case, block in zip(ordered_cases[starts].tolist(), numpy.split(order, starts[1:])):
+                rows[case] = block.tolist()
+        else:
+            order = sorted(
+                (case, when, run, n)
+                for n, (case, when, run) in enumerate(zip(self.cases, self.executed, self.runs))
+                if when == when  # NaN != NaN: not executed
+            )
+            for case, _, _, n in order:
+                rows.setdefault(case, []).append(n)
+        self.case_rows = rows
+        return rows
+
+    def latest_status(self):
+        """
+        :return: <dict> : Test case documentKey: status of its most recently executed run, NOT_RUN if none
+        """
+        latest = {self._case_key(case): "NOT_RUN" for case in set(self.cases)}
+        for case, rows in self._by_case_in_order().items():
+            latest[self._case_key(case)] = self.statuses[self.status_codes[rows[-1]]]
+        return latest
+
+    def flaky(self, min_flips=1, last=None):
+        """
+        Test cases whose executed runs have gone from PASSED to FAILED or back
+        :param min_flips: <int> : Fewest changes between PASSED and FAILED to count as flaky
+        :param last: <int> : Only look at each test case's most recent runs (default all)
+        :return: <dict> : Test case documentKey: number of changes, for flaky test cases
+        """
+        passed, failed = self.status_index["PASSED"], self.status_index["FAILED"]
+        found = {}
+        for case, rows in self._by_case_in_order().items():
+            codes = [self.status_codes[n] for n in (rows[-last:] if last else rows)]
+            outcomes = [code for code in codes if code in (passed, failed)]
+            flips = sum(1 for a, b in zip(outcomes, outcomes[1:]) if a != b)
+            if flips >= min_flips:
+                found[self._case_key(case)] = flips
+        return found
+
+
+def plan_test_runs(jama, plan, workers=None):
+    """
+    Fetch the runs of every test cycle in a test plan into a TestRunTable, cycles and groups concurrently
+    :param jama: <jama> : Client to query
+    :param plan: <int> : JAMA ID of test plan
+    :param workers: <int> : Number of concurrent requests (default is client's batch_workers)
+    :return: <TestRunTable>
+    """
+    cycles = list(jama.get_testcycles(plan).values())
+    groups = list(jama.get_testgroups(plan).values())
+    group_cases = jama.concurrent(lambda group: jama.get_groupcases(plan, group), groups, workers)
+    group_of = {}  # Test case JAMA ID: first group it is in
+    for group, cases in zip(groups, group_cases):
+        for case in cases:
+            group_of.setdefault(case["id"], group)
+    found = jama.concurrent(
+        lambda cycle: jama.ask_big(
+            f"/testcycles/{cycle}/testruns", field="tc", args={"include": "data.fields.testCase"}, fields=RUN_FIELDS
+        ),
+        cycles,
+        workers,
+    )
+    table = TestRunTable()
+    for tcmap, runs in found:
+        table.documentKeys.update((int(case), key) for case, key in tcmap.items())
+        for run in runs:
+            table.add_run(run, group_of.get(run.testCase))
+    return table
@@ -0,0 +1,182 @@
+"""
+Traceability graph crawler for JAMA
+Walks relationships upstream and/or downstream from root items breadth first, fetching each level's items
+concurrently and visiting each item only once, into a compact graph that can be exported as a trace matrix.
+
+Usage:
+    graph = crawl_trace(jam, filter_id="All requirements", direction="downstream", depth=3)
+    graph.write_csv("trace.csv")
+
+The MIT licence:
+Copyright (c) 2016-2019 Optos plc
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated documentation files (the "Software"), to deal in the Software without restriction, including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+import csv
+from array import array
+
+
+class TraceGraph:
+    """
+    Items and the relationships between them, held as arrays:
+    items[n] is the JAMA ID of node n, depths[n] its distance from the roots,
+    and relationship i runs from node sources[i] to node targets[i], with types[i] and JAMA ID relationship_ids[i].
+    Each node's relationships are found through offset arrays, built once when first needed after a change.
+    """
+
+    def __init__(self):
+        self.items = array("q")
+        self.depths = array("l")
+        self.index = {}  # JAMA ID: node number
+        self.sources = array("l")
+        self.targets = array("l")
+        self.types = array("q")  # 0 if relationship has no type
+        self.relationship_ids = array("q")
+        self.seen_relationships = set()
+        self.documentKeys = {}  # JAMA ID: documentKey, of items linked from the relationships crawled
+        self.adjacency = {}  # "downstream"/"upstream": (offsets, nodes), dropped on any change
+
+    def add_item(self, item, depth):
+        """
+        Add an item if not already in the graph
+        :param item: <int> : JAMA ID of item
+        :param depth: <int> : Distance from the roots
+        :return: <bool> : True if it was new
+        """
+        if item in self.index:
+            return False
+        self.index[item] = len(self.items)
+        self.items.append(item)
+        self.depths.append(depth)
+        self.adjacency = {}
+        return True
+
+    def add_relationship(self, relationship):
+        """
+        Add a relationship from JAMA, if not already in the graph. Both its items must already be added.
+        :param relationship: <dict> : JAMA relationship
+        """
+        if relationship["id"] in self.seen_relationships:
+            return
+        self.seen_relationships.add(relationship["id"])
+        self.sources.append(self.index[relationship["fromItem"]])
+        self.targets.append(self.index[relationship["toItem"]])
+        self.types.append(relationship.get("relationshipType") or 0)
+        self.relationship_ids.append(relationship["id"])
+        self.adjacency = {}
+
+    def __len__(self):
+        return len(self.items)
+
+    def _adjacent(self, direction):
+        """
+        :param direction: <str> : "downstream" or "upstream"
+        :return: <tuple> : offsets and nodes arrays: node n's neighbours are nodes[offsets[n]:offsets[n + 1]],
+            in the order their relationships were added
+        """
+        if direction not in self.adjacency:
+            ends, others = (self.sources, self.targets) if direction == "downstream" else (self.targets, self.sources)
+            offsets = array("l", [0] * (len(self.items) + 1))
+            for end in ends:
+                offsets[end + 1] += 1
+            for n in range(len(self.items)):
+                offsets[n + 1] += offsets[n]
+            filled = array("l", offsets)
+            nodes = array("l", [0] * len(ends))
+            for end, other in zip(ends, others):
+                nodes[filled[end]] = other
+                filled[end] += 1
+            self.adjacency[direction] = (offsets, nodes)
+        return self.adjacency[direction]
+
+    def downstream_of(self, item):
+        """
+        :param item: <int> : JAMA ID of item
+        :return: <list> : JAMA IDs of items directly downstream
+        """
+        node = self.index[item]
+        offsets, nodes = self._adjacent("downstream")
+        return [self.items[t] for t in nodes[offsets[node] : offsets[node + 1]]]
+
+    def upstream_of(self, item):
+        """
+        :param item: <int> : JAMA ID of item
+        :return: <list> : JAMA IDs of items directly upstream
+        """
+        node = self.index[item]
+        offsets, nodes = self._adjacent("upstream")
+        return [self.items[s] for s in nodes[offsets[node] : offsets[node + 1]]]
+
+    def trace_matrix(self):
+        """
+        :return: <list of tuples> : (upstream JAMA ID, downstream JAMA ID, relationship type) for each relationship
+        """
+        return [
+            (self.items[s], self.items[t], r or None)
+            for s, t, r in zip(self.sources, self.targets, self.types)
+        ]
+
+    def write_csv(self, path, jama=None):
+        """
+        Write the trace matrix to a CSV file, using the JAMA string IDs found while crawling
+        :param path: <str> : File to write
+        :param jama: <jama> : Client to look up any documentKeys not found while crawling (default write JAMA IDs)
+        """
+        names = dict(self.documentKeys)
+        missing = [item for item in self.items if item not in names]
+        if jama and missing:
+            names.update(jama.find_uniqids(missing))
+        with open(path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["upstream", "downstream", "relationshipType"])
+            for upstream, downstream, rtype in self.trace_matrix():
+                writer.writerow([names.get(upstream, upstream), names.get(downstream, downstream), rtype or ""])
+
+
+def crawl_trace(jama, roots=None, filter_id=None, direction="downstream", depth=None, workers=None):
+    """
+    Build the traceability graph around some root items
+    :param jama: <jama> : Client to query
+    :param roots: <list of ints> : JAMA IDs of items to start from
+    :param filter_id: <int/str> : JAMA filter name or ID whose results are added to the roots
+    :param direction: <str> : "downstream", "upstream" or "both"
+    :param depth: <int> : Most relationships to follow from a root (default no limit)
+    :param workers: <int> : Number of concurrent requests (default is client's batch_workers)
+    :return: <TraceGraph>
+    """
+    if direction not in ("downstream", "upstream", "both"):
+        raise Exception(f"Unknown trace direction {direction}")
+    roots = list(roots or [])
+    if filter_id is not None:
+        roots += [x["id"] for x in jama.get_filter_results(filter_id)]
+    resources = []
+    if direction in ("downstream", "both"):
+        resources.append("downstreamrelationships")
+    if direction in ("upstream", "both"):
+        resources.append("upstreamrelationships")
+
+    graph = TraceGraph()
+    frontier = [item for item in roots if graph.add_item(item, 0)]
+    level = 0
+    while frontier and (depth is None or level < depth):
+        level += 1
+        queries = [(item, resource) for item in frontier for resource in resources]
+        # Including both ends' items brings their documentKeys, saving a lookup per node when exporting
+        found = jama.concurrent(
+            lambda query: jama.ask_big(
+                f"/items/{query[0]}/{query[1]}", {"include": "data.fromItem,data.toItem"}, field="tc"
+            ),
+            queries,
+            workers,
+        )
+        frontier = []
+        for linked, relationships in found:
+            graph.documentKeys.update((int(item), key) for item, key in linked.items())
+            for rel in relationships:
+                for end in (rel["fromItem"], rel["toItem"]):
+                    if graph.add_item(end, level):
+                        frontier.append(end)
+                graph.add_relationship(rel)
+    return graph